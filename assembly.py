@@ -0,0 +1,71 @@
+from build123d import Color, Compound, Pos, Rotation
+from build123d.topology import downcast
+
+import brep
+
+# Where the whole case goes in the scene
+ROOT = Rotation(about_y=180) * Pos(10, 0, 0)
+COLOR = (0, 0, 0)
+# (parent, its joint, child, its joint), each child placed by its parent
+CONNECTIONS = [
+    ("cover", "switch_slide", "switch", "joint"),
+    ("cover", "button", "button", "joint"),
+    ("cover", "bottom", "bottom", "joint"),
+    ("cover", "mc_cover", "mc_cover", "joint"),
+]
+
+
+class Assembly:
+    # The parts as built, in their own coordinates, and where each one goes
+    # as a Location composed from the joints. Posing only recomputes those;
+    # the shapes are placed once something needs them (export, display), and
+    # then share their geometry with the built parts instead of copying it.
+    def __init__(
+        self, parts, label="Corne Wireless Case", location=ROOT, color=COLOR,
+        connections=CONNECTIONS,
+    ):
+        self.parts = parts
+        self.label = label
+        self.location = location
+        self.color = color
+        self.connections = connections
+        self.placements = {}
+        self.pose()
+
+    def pose(self, switch_position=None):
+        # Place the parts relative to the cover, the switch at the start of
+        # its slide unless given a position in it. Same as connecting the
+        # joints, without moving the parts.
+        slide = {} if switch_position is None else {"position": switch_position}
+        placements = {}
+        for parent, parent_joint, child, child_joint in self.connections:
+            joint = self.parts[parent].joints[parent_joint]
+            kwargs = slide if parent_joint == "switch_slide" else {}
+            relative = joint.relative_to(self.parts[child].joints[child_joint], **kwargs)
+            start = placements.get(parent, self.parts[parent].location)
+            placements[child] = start * relative
+        for name, part in self.parts.items():
+            placements.setdefault(name, part.location)
+        self.placements = placements
+        return self
+
+    def placed(self, name):
+        # The part where the assembly puts it (relative to the assembly's own
+        # location), colored, without joints: those stay on the built part
+        part = self.parts[name]
+        state = brep.state(part)
+        location = self.placements[name].wrapped
+        state["wrapped"] = downcast(part.wrapped.Located(location))
+        state["color"] = None if self.color is None else tuple(Color(*self.color))
+        state["joints"] = []
+        return brep.from_state(state)
+
+    def compound(self):
+        # Everything as one labelled Compound at the assembly's location,
+        # e.g. for show() or export_assembly()
+        compound = Compound(
+            label=self.label, children=[self.placed(name) for name in self.parts]
+        )
+        compound.location = self.location
+        return compound
+
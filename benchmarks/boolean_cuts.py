@@ -0,0 +1,74 @@
+# Per-feature vs batched boolean cuts for the key and screw holes.
+#
+#   python -m benchmarks.boolean_cuts [--repeat N]
+import argparse
+import statistics
+import time
+
+from build123d import *
+
+from corne_board import BasePlateSketch, KeyLocations, ScrewLocations
+from utils import batch_cut
+
+C = Align.CENTER
+
+
+def per_feature_cut(shape, locations, *tools):
+    for loc in locations:
+        for tool in tools:
+            shape -= loc * tool
+    return shape
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def cases(cols):
+    sketch = BasePlateSketch(cols=cols, screw_radius=0)
+    plate = extrude(sketch, 5)
+    plane = Plane((0, 0, 5))
+    keys = KeyLocations(cols=cols)
+    screws = ScrewLocations(cols=cols)
+    hole = Rectangle(13.8, 13.8, align=(C, C))
+    pockets = (
+        extrude(Rectangle(15.5, 15.5, align=(C, C)), -0.8),
+        extrude(Rectangle(13.5, 13.7, align=(C, C)), -2.1),
+    )
+    return {
+        "sketch key holes": (sketch, keys, (hole,)),
+        "sketch screw holes": (sketch, screws, (Circle(1.2),)),
+        "part key pockets": (plate, plane * keys, pockets),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare per-feature and batched boolean cuts"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<28}{'features':>9}{'loop':>10}{'batched':>10}{'parallel':>10}{'speedup':>9}")
+    for cols in (5, 6):
+        for name, (shape, locations, tools) in cases(cols).items():
+            locations = list(locations)
+            loop = timed(lambda: per_feature_cut(shape, locations, *tools), args.repeat)
+            batched = timed(lambda: batch_cut(shape, locations, *tools), args.repeat)
+            parallel = timed(
+                lambda: batch_cut(shape, locations, *tools, parallel=True), args.repeat
+            )
+            print(
+                f"{f'cols={cols} {name}':<28}{len(locations) * len(tools):>9}"
+                f"{loop * 1000:>8.1f}ms{batched * 1000:>8.1f}ms{parallel * 1000:>8.1f}ms"
+                f"{loop / min(batched, parallel):>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
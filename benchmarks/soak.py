@@ -0,0 +1,97 @@
+# Memory soak test: build and export the same variants round after round in
+# one process, the way sweep workers and daemon.py workers run jobs, and
+# check that RSS stays flat. Warmup rounds fill the caches and the kernel's
+# own pools, after that the RSS at the end of each round may only grow by
+# --limit MB in total.
+#
+#   python -m benchmarks.soak [--rounds N] [--warmup N] [--warm] [-o rss.json]
+import argparse
+import json
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+# Parameter sets built every round, UPPER_CASE ones override constants
+VARIANTS = [{"cols": 5}, {"cols": 6}, {"cols": 6, "THICKNESS": 7}]
+FORMATS = ("stl", "step")
+LIMIT_MB = 16
+
+
+def soak(rounds, warmup, variants=VARIANTS, formats=FORMATS, warm=False, out_dir=None):
+    from build import PARTS, setup_logging
+    from cache import cache, memo
+    from daemon import parse_job, run_job
+    from export import set_skip_unchanged
+    from memory import current_rss, peak_rss, release
+
+    setup_logging(logging.WARNING)
+    # Unchanged outputs would be skipped after the first round
+    set_skip_unchanged(False)
+    if not warm:
+        # Every round rebuilds everything, so whatever builders leak adds up
+        cache.enabled = memo.enabled = False
+    out_dir = out_dir or tempfile.mkdtemp(prefix="corne-soak-")
+    jobs = [
+        parse_job({"parts": list(PARTS), "params": params, "formats": list(formats),
+                   "out_dir": out_dir})
+        for params in variants
+    ]
+    results = []
+    for i in range(warmup + rounds):
+        start = time.perf_counter()
+        for job in jobs:
+            run_job(job)
+        release()
+        results.append({
+            "round": i,
+            "warmup": i < warmup,
+            "seconds": time.perf_counter() - start,
+            "rss": current_rss(),
+            "peak_rss": peak_rss(),
+        })
+        log_round(results[-1])
+    return results
+
+
+def log_round(result):
+    print(
+        f"round {result['round']:>3}{' (warmup)' if result['warmup'] else '':<10}"
+        f"{result['seconds']:>7.2f}s{result['rss'] / 2**20:>8.1f}MB RSS"
+        f"{result['peak_rss'] / 2**20:>8.1f}MB peak"
+    )
+
+
+def growth(results):
+    # MB gained from the first to the last measured round, and the fitted
+    # slope in MB per round
+    rss = np.array([r["rss"] for r in results if not r["warmup"]]) / 2**20
+    slope = np.polyfit(np.arange(len(rss)), rss, 1)[0] if len(rss) > 1 else 0.0
+    return rss[-1] - rss[0], slope
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that repeated builds keep a flat RSS")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--warm", action="store_true",
+        help="keep the BREP cache and memo on, like a long-running server",
+    )
+    parser.add_argument("--limit", type=float, default=LIMIT_MB, help="MB of growth allowed")
+    parser.add_argument("-o", "--output", metavar="JSON", help="write the rounds here")
+    args = parser.parse_args(argv)
+
+    results = soak(args.rounds, args.warmup, warm=args.warm)
+    gained, slope = growth(results)
+    print(f"RSS grew {gained:+.1f}MB over {args.rounds} rounds ({slope:+.2f}MB/round)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rounds": results, "growth_mb": gained, "slope_mb": slope}, f, indent=2)
+    if gained > args.limit:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
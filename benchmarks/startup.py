@@ -0,0 +1,60 @@
+# Startup cost of short-lived build processes, each case in a fresh
+# interpreter: CLI help, imports and time to the first built part.
+#
+#   python -m benchmarks.startup [--repeat N] [--part switch]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cases(part):
+    first_part = (
+        "from build import build_part; "
+        f"build_part({part!r}, {{'cols': 6}})"
+    )
+    return {
+        "build.py --help": (["build.py", "--help"], {}),
+        "sweep.py --help": (["sweep.py", "--help"], {}),
+        "import build": (["-c", "import build"], {}),
+        "import build123d": (["-c", "import build123d"], {}),
+        f"first part ({part}, cached)": (["-c", first_part], {}),
+        f"first part ({part}, no cache)": (["-c", first_part], {"CORNE_CACHE": "0"}),
+    }
+
+
+def timed(args, env, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args], cwd=ROOT, env={**os.environ, **env},
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the startup of fresh build processes"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--part", default="switch")
+    args = parser.parse_args(argv)
+
+    # Warm the BREP cache for the cached case
+    timed(cases(args.part)[f"first part ({args.part}, cached)"][0], {}, 1)
+
+    print(f"{'case':<32}{'median':>10}{'min':>10}")
+    for name, (cmd, env) in cases(args.part).items():
+        times = timed(cmd, env, args.repeat)
+        print(f"{name:<32}{statistics.median(times):>9.2f}s{min(times):>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
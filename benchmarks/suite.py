@@ -0,0 +1,199 @@
+# Build and export times of every part, per parameter set. Each case runs in
+# a fresh interpreter with the BREP cache and memo off: warmup runs, then
+# repeated timed ones for the median and p95, the peak RSS of the process and
+# the size of the exported files.
+#
+#   python -m benchmarks.suite [--repeat N] [--warmup N] [-o results.json]
+#   python -m benchmarks.suite --compare baseline.json [--threshold 0.1]
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, class path, arguments)
+BUILDS = [
+    ("cover cols=5", "cover.Cover", {"cols": 5}),
+    ("cover cols=6", "cover.Cover", {"cols": 6}),
+    ("bottom cols=5", "bottom.BottomPlate", {"cols": 5}),
+    ("bottom cols=6", "bottom.BottomPlate", {"cols": 6}),
+    ("mc_cover", "mc_cover.MCCover", {}),
+    ("switch", "switch.PowerSwitch", {}),
+    ("button", "button.Button", {}),
+    ("key plate sketch cols=5", "corne_board.KeyPlateSketch", {"cols": 5}),
+    ("key plate sketch cols=6", "corne_board.KeyPlateSketch", {"cols": 6}),
+]
+# Parts exported in every format, by build name
+EXPORTS = ["cover cols=5", "cover cols=6", "bottom cols=6", "mc_cover", "switch", "button"]
+EXPORT_FORMATS = ("stl", "step", "3mf")
+# A case regresses when its median time or peak RSS grows by more than this
+THRESHOLD = 0.10
+
+
+def cases():
+    names = [f"build {name}" for name, _, _ in BUILDS]
+    names += [f"{fmt} {name}" for name in EXPORTS for fmt in EXPORT_FORMATS]
+    return names
+
+
+def percentile(times, q):
+    ordered = sorted(times)
+    index = (len(ordered) - 1) * q / 100
+    low = int(index)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def run_case(case, warmup, repeat):
+    # In the worker process
+    from build import load_class, setup_logging
+    from export import export_part
+    from memory import peak_rss
+
+    setup_logging(logging.WARNING)
+    action, _, name = case.partition(" ")
+    path, kwargs = {n: (p, k) for n, p, k in BUILDS}[name]
+    cls = load_class(path)
+    sizes = {}
+    out_dir = tempfile.mkdtemp(prefix="corne-bench-")
+    if action == "build":
+        def run():
+            cls(**kwargs)
+    else:
+        from OCP.BRepTools import BRepTools
+
+        part = cls(**kwargs)
+
+        def run():
+            # Mesh again every time, and write a new file rather than compare
+            BRepTools.Clean_s(part.wrapped)
+            for output in export_part(part, [action], out_dir):
+                sizes[os.path.basename(output)] = os.path.getsize(output)
+                os.remove(output)
+
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    shutil.rmtree(out_dir)
+    return {
+        "times": times,
+        "median": statistics.median(times),
+        "p95": percentile(times, 95),
+        "min": min(times),
+        "peak_rss": peak_rss(),
+        "file_sizes": sizes,
+    }
+
+
+def measure(case, warmup, repeat):
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.suite", "--run-case", case,
+            "--warmup", str(warmup), "--repeat", str(repeat),
+        ],
+        cwd=ROOT, env={**os.environ, "CORNE_CACHE": "0", "CORNE_MEMO": "0"},
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def environment():
+    from importlib.metadata import version
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    ).stdout.strip()
+    return {
+        "commit": commit or None,
+        "python": sys.version.split()[0],
+        "build123d": version("build123d"),
+        "platform": sys.platform,
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # Cases slower or bigger in memory than the baseline by over `threshold`
+    regressions = []
+    for case, result in results["cases"].items():
+        before = baseline["cases"].get(case)
+        if before is None:
+            continue
+        for metric in ("median", "peak_rss"):
+            ratio = result[metric] / before[metric] - 1
+            if ratio > threshold:
+                regressions.append((case, metric, before[metric], result[metric], ratio))
+    return regressions
+
+
+def _format(metric, value):
+    if metric == "peak_rss":
+        return f"{value / 2**20:.0f}MB"
+    return f"{value:.3f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the part builds and exports"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--cases", nargs="+", choices=cases(), metavar="CASE",
+        help="only these cases, e.g. 'build cover cols=5' or 'stl mc_cover'",
+    )
+    parser.add_argument("-o", "--output", metavar="JSON", help="write the results here")
+    parser.add_argument(
+        "--compare", metavar="JSON",
+        help="baseline results, exit with an error on regressions",
+    )
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.warmup, args.repeat)))
+        return
+
+    results = {"environment": environment(), "repeat": args.repeat, "cases": {}}
+    print(f"{'case':<34}{'median':>10}{'p95':>10}{'peak RSS':>10}{'size':>11}")
+    for case in args.cases or cases():
+        result = measure(case, args.warmup, args.repeat)
+        results["cases"][case] = result
+        size = sum(result["file_sizes"].values())
+        print(
+            f"{case:<34}{result['median']:>9.3f}s{result['p95']:>9.3f}s"
+            f"{result['peak_rss'] / 2**20:>8.0f}MB"
+            f"{f'{size / 1024:.0f}kB' if size else '':>11}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, before, after, ratio in regressions:
+            print(
+                f"regression {case} {metric}: "
+                f"{_format(metric, before)} -> {_format(metric, after)} ({ratio:+.0%})"
+            )
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,29 @@
 from build123d import *
 
+from cache import cached, memoized
 from corne_board import BasePlateLine, ScrewLocations
+from profiler import mark, profiled
+from utils import batch_cut
 
 C, MIN, MAX = Align.CENTER, Align.MIN, Align.MAX
 
 
+@memoized
+@profiled
+@cached
 class BottomPlate(Part):
     def __init__(self, cols=6, **kwargs):
         kwargs["label"] = kwargs.get("label", "Bottom plate")
         sk = make_face(BasePlateLine(cols=cols))
         part = extrude(sk, 1.3)
+        mark("plate", part)
 
         # Add threaded inserts
         top_face = part.faces().sort_by(Axis.Z).last
         plane = Plane((0, 0, top_face.center().Z))
         part += plane * ScrewLocations(cols=cols) * Cylinder(3, 1.5)
         part -= plane * ScrewLocations(cols=cols) * Cylinder(2, 1.5)
+        mark("threaded inserts", part)
 
         # Add feet pads insets
         radius = 4.5
@@ -27,17 +35,22 @@ class BottomPlate(Part):
 
         inset = Cylinder(radius, .5, align=(C, C, MIN))
 
-        part -= Pos(corners[0].X + offset, corners[0].Y + offset, z) * inset
-        part -= Pos(corners[1].X + offset, corners[1].Y - offset, z) * inset
-        part -= Pos(corners[2].X - offset, corners[2].Y - offset, z) * inset
-        part -= Pos(corners[3].X - offset, corners[3].Y + offset, z) * inset
+        feet = [
+            Pos(corners[0].X + offset, corners[0].Y + offset, z),
+            Pos(corners[1].X + offset, corners[1].Y - offset, z),
+            Pos(corners[2].X - offset, corners[2].Y - offset, z),
+            Pos(corners[3].X - offset, corners[3].Y + offset, z),
+        ]
 
         # Add a fifth foot for stability
         corner = bottom_face.vertices().sort_by(Axis.Y).first
-        part -= Pos(corner.X + 2, corner.Y + offset + 2, z) * inset
+        feet.append(Pos(corner.X + 2, corner.Y + offset + 2, z))
+        part = batch_cut(part, feet, inset)
+        mark("feet", part)
 
         # mirror 180°
         part = mirror(part, about=Plane.YZ)
+        mark("mirror", part)
 
         # Add connection point for cover
         joint = RigidJoint("joint", part, joint_location=Location(Plane.XY))
@@ -0,0 +1,196 @@
+import hashlib
+import importlib
+import io
+import pickle
+import re
+
+import numpy as np
+from build123d import Axis, Color, LinearJoint, Location, Plane, RigidJoint
+from build123d.topology import downcast
+from OCP.BRep import BRep_Builder
+from OCP.BRepBuilderAPI import BRepBuilderAPI_Copy
+from OCP.BRepTools import BRepTools
+from OCP.gp import gp_Trsf
+from OCP.TopoDS import TopoDS_Shape
+from OCP.TopTools import TopTools_FormatVersion
+
+# Shapes are written as text BREP: the binary format doesn't round-trip some
+# of the filleted hulls with every OCCT version.
+
+
+def _location_to_list(loc):
+    trsf = loc.wrapped.Transformation()
+    return [trsf.Value(r, c) for r in range(1, 4) for c in range(1, 5)]
+
+
+def _location_from_list(values):
+    trsf = gp_Trsf()
+    trsf.SetValues(*values)
+    return Location(trsf)
+
+
+def _joint_to_dict(joint):
+    parent_loc = joint.parent.location
+    if isinstance(joint, RigidJoint):
+        return {
+            "type": "rigid",
+            "label": joint.label,
+            "location": _location_to_list(parent_loc * joint.relative_location),
+        }
+    if isinstance(joint, LinearJoint):
+        axis = joint.relative_axis.located(parent_loc)
+        return {
+            "type": "linear",
+            "label": joint.label,
+            "position": tuple(axis.position),
+            "direction": tuple(axis.direction),
+            "linear_range": tuple(joint.linear_range),
+        }
+    raise TypeError(f"Can't serialize {type(joint).__name__} {joint.label!r}")
+
+
+def _joint_from_dict(data, part):
+    if data["type"] == "rigid":
+        location = _location_from_list(data["location"])
+        return RigidJoint(data["label"], part, joint_location=location)
+    axis = Axis(data["position"], data["direction"])
+    return LinearJoint(
+        data["label"], part, axis=axis, linear_range=data["linear_range"]
+    )
+
+
+def shape_to_brep(shape):
+    stream = io.BytesIO()
+    BRepTools.Write_s(shape.wrapped, stream)
+    return stream.getvalue()
+
+
+# geometry_digest() rounds to this many decimals: the last digits change in
+# a BREP round trip (directions are normalized again on reading), between
+# builds from cached or fresh sketches and when other booleans grow the
+# tolerance of vertices and edges shared with other shapes
+DIGEST_DECIMALS = 9
+_NUMBER = re.compile(rb"(?<![\w.])(-?\d+(?:\.\d*)?(?:e[-+]?\d+)?)")
+# TShape flags, meshing sets "checked"
+_FLAGS = re.compile(rb"^[01]{7}\r?$", re.M)
+
+
+def geometry_digest(shape):
+    # Hash of the shape's text BREP without meshes, the same whether it was
+    # built, loaded, copied or meshed. Written from a copy of the topology:
+    # edges shared with other shapes (copy.copy, a sketch used twice) also
+    # carry the pcurves of their booleans, the copy only keeps its own.
+    own = BRepBuilderAPI_Copy(shape.wrapped, False, False).Shape()
+    stream = io.BytesIO()
+    BRepTools.Write_s(own, stream, False, False, TopTools_FormatVersion.TopTools_FormatVersion_VERSION_1)
+    # Text and numbers alternate, the numbers are hashed as rounded doubles
+    parts = _NUMBER.split(_FLAGS.sub(b"", stream.getvalue()))
+    numbers = np.array(parts[1::2]).astype(np.float64).round(DIGEST_DECIMALS) + 0.0
+    digest = hashlib.sha256(b"\0".join(parts[0::2]))
+    digest.update(numbers.tobytes())
+    return digest.hexdigest()
+
+
+def brep_to_wrapped(data):
+    wrapped = TopoDS_Shape()
+    BRepTools.Read_s(wrapped, io.BytesIO(data), BRep_Builder())
+    return downcast(wrapped)
+
+
+def state(shape):
+    # Everything needed to recreate a Part/Sketch/Curve (incl. subclasses like
+    # Cover) without running its builder, joints in global coordinates
+    cls = type(shape)
+    return {
+        "class": (cls.__module__, cls.__qualname__),
+        "wrapped": shape.wrapped,
+        "label": shape.label,
+        "color": None if shape.color is None else tuple(shape.color),
+        "joints": [_joint_to_dict(j) for j in getattr(shape, "joints", {}).values()],
+        # Plain attributes the builders set on themselves, e.g. `cols`
+        "attrs": {
+            k: v for k, v in vars(shape).items()
+            if isinstance(v, (int, float, str, bool, type(None)))
+            and k not in ("label",)
+            and not k.startswith("_")
+        },
+    }
+
+
+def from_state(state, shape=None):
+    # Restore into `shape` if given, e.g. from within the builder's __init__
+    if shape is None:
+        module, qualname = state["class"]
+        cls = getattr(importlib.import_module(module), qualname)
+        shape = cls.__new__(cls)
+    cls = type(shape)
+
+    # Bypass the builder's __init__, only the base shape needs initializing
+    base = next(c for c in cls.__mro__ if c.__module__.startswith("build123d"))
+    kwargs = {"label": state["label"]}
+    if state["color"] is not None:
+        kwargs["color"] = Color(*state["color"])
+    base.__init__(shape, state["wrapped"], **kwargs)
+    for k, v in state["attrs"].items():
+        setattr(shape, k, v)
+
+    if state["joints"]:
+        shape.joints = {}
+        for joint in state["joints"]:
+            _joint_from_dict(joint, shape)
+    return shape
+
+
+def dumps(shape):
+    data = state(shape)
+    del data["wrapped"]
+    data["brep"] = shape_to_brep(shape)
+    return pickle.dumps(data)
+
+
+def loads(data, shape=None):
+    data = pickle.loads(data)
+    data["wrapped"] = brep_to_wrapped(data.pop("brep"))
+    return from_state(data, shape)
+
+
+def _value_to_state(value):
+    if isinstance(value, Plane):
+        return ("plane", tuple(value.origin), tuple(value.x_dir), tuple(value.z_dir))
+    if isinstance(value, Location):
+        return ("location", _location_to_list(value))
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+def _value_from_state(state):
+    kind, *values = state
+    if kind == "plane":
+        return Plane(*values)
+    return _location_from_list(*values)
+
+
+def dumps_stage(shape, builder, attrs=()):
+    # An intermediate result of a staged builder: the shape so far, the
+    # `attrs` (planes, locations) it set on itself for later stages and the
+    # joints added so far
+    return pickle.dumps({
+        "shape": dumps(shape),
+        "attrs": {
+            name: _value_to_state(getattr(builder, name))
+            for name in attrs if hasattr(builder, name)
+        },
+        "joints": [_joint_to_dict(j) for j in getattr(builder, "joints", {}).values()],
+    })
+
+
+def loads_stage(data, builder):
+    # The shape from dumps_stage, restoring the builder's attributes and
+    # joints (attached to that shape) on the way
+    data = pickle.loads(data)
+    shape = loads(data["shape"])
+    for name, value in data["attrs"].items():
+        setattr(builder, name, _value_from_state(value))
+    builder.joints = {}
+    for joint in data["joints"]:
+        builder.joints[joint["label"]] = _joint_from_dict(joint, shape)
+    return shape
@@ -0,0 +1,367 @@
+import argparse
+import importlib
+import inspect
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import memo
+from deps import dependencies, digest
+from export import (
+    DEFAULT_FORMATS, FORMATS, PART_TESSELLATION, TESSELLATION, export_assembly,
+    export_part, set_skip_unchanged,
+)
+from params import DRAFT, FINAL, HANDS, QUALITY, is_draft, set_quality
+from profiler import profiler
+from validate import validate
+
+log = logging.getLogger(__name__)
+
+COLS = 6
+# Records what each part's outputs were built from, for --incremental
+STATE_FILE = ".build-state.json"
+# Part classes by import path. The CAD kernel takes seconds to import, so the
+# part modules (and brep, build123d) are only imported once something gets
+# built, `--help` and argument errors stay instant.
+PARTS = {
+    "cover": "cover.Cover",
+    "switch": "switch.PowerSwitch",
+    "button": "button.Button",
+    "bottom": "bottom.BottomPlate",
+    "mc_cover": "mc_cover.MCCover",
+}
+
+
+def setup_logging(level=logging.INFO):
+    # Make OCCT less verbose
+    from OCP import Message
+    for printer in Message.Message.DefaultMessenger_s().Printers():
+        printer.SetTraceLevel(Message.Message_Gravity(3))
+    logging.basicConfig(level=level, format="%(message)s")
+    logging.getLogger("build123d").setLevel(logging.WARNING)
+    logging.captureWarnings(True)
+
+
+def load_class(path):
+    # "cover.Cover" -> the Cover class, importing its module on first use
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+def part_class(name):
+    return load_class(PARTS[name])
+
+
+def part_kwargs(cls, params):
+    # Only pass the parameters a part's constructor accepts (e.g. `cols`)
+    accepted = inspect.signature(cls).parameters
+    return {k: v for k, v in params.items() if k in accepted}
+
+
+def build_part(name, params):
+    cls = part_class(name)
+    start = time.perf_counter()
+    part = cls(**part_kwargs(cls, params))
+    log.info(f'Built "{part.label}" in {time.perf_counter() - start:.2f}s')
+    return part
+
+
+def export_hands(part, formats, out_dir, mesh_options=None, hands=None):
+    # Without `hands` the part is exported as built, otherwise once per half
+    from handedness import handed
+
+    if hands is None:
+        return export_part(part, formats, out_dir, mesh_options)
+    return [
+        path
+        for hand in hands
+        for path in export_part(handed(part, hand), formats, out_dir, mesh_options)
+    ]
+
+
+def export_assembly_hands(assembly, formats, out_dir, mesh_options=None, hands=None):
+    # The assembly as single files, mirrored part by part for the other half
+    from build123d import Compound
+    from handedness import handed
+
+    if hands is None:
+        return export_assembly(assembly, formats, out_dir, mesh_options, parts=False)
+    paths = []
+    for hand in hands:
+        half = Compound(
+            label=f"{assembly.label} ({hand})",
+            children=[handed(part, hand) for part in assembly.children],
+        )
+        half.location = assembly.location
+        paths += export_assembly(half, formats, out_dir, mesh_options, parts=False)
+    return paths
+
+
+def build_and_export(
+    name, params, formats=DEFAULT_FORMATS, out_dir=".", mesh_options=None, hands=None,
+):
+    part = build_part(name, params)
+    return export_hands(part, formats, out_dir, mesh_options, hands)
+
+
+# Workers exchange parts as BREP so joints survive the process boundary
+def _build_brep(name, params):
+    import brep
+
+    return brep.dumps(build_part(name, params))
+
+
+def _export_brep(data, formats, out_dir, mesh_options, hands):
+    import brep
+
+    return export_hands(brep.loads(data), formats, out_dir, mesh_options, hands)
+
+
+def _in_worker(fn, *args):
+    # Hand the worker's profile records and memo counts back along with the
+    # result
+    return fn(*args), profiler.drain(), memo.drain()
+
+
+def _result(future):
+    result, builds, memo_counts = future.result()
+    profiler.builds += builds
+    memo.merge(memo_counts)
+    return result
+
+
+def assemble(parts):
+    # The case as one Compound of the placed parts, see assembly.Assembly
+    from assembly import Assembly
+
+    return Assembly(parts).compound()
+
+
+def part_key(name, params):
+    # Changes with the part's arguments and the source and constants it
+    # depends on, e.g. Button only with its own code and HULL_THICKNESS
+    cls = part_class(name)
+    return digest(
+        cls.__qualname__, sorted(part_kwargs(cls, params).items()), dependencies(cls)
+    )
+
+
+def output_keys(names, params, formats, assembly, mesh_options=None, hands=None):
+    quality = DRAFT if is_draft() else FINAL
+    export = (
+        sorted(formats),
+        hands,
+        TESSELLATION[quality],
+        sorted(PART_TESSELLATION[quality].items()),
+        sorted((mesh_options or {}).items()),
+    )
+    keys = {name: digest(part_key(name, params), export) for name in names}
+    if assembly:
+        # Placements come from the joints of every part, the combined files
+        # are recorded as "assembly"
+        combined = digest(assembly, sorted(keys.items()))
+        keys = {name: combined for name in [*names, "assembly"]}
+    return keys
+
+
+def _load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(out_dir, state):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, STATE_FILE), "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def _up_to_date(entry, key):
+    return (
+        entry is not None
+        and entry["key"] == key
+        and all(os.path.exists(path) for path in entry["outputs"])
+    )
+
+
+def build(
+    names=tuple(PARTS), params=None, formats=DEFAULT_FORMATS, out_dir=".", jobs=None,
+    assembly=False, incremental=False, mesh_options=None, hands=None, check_layout=True,
+):
+    params = {"cols": COLS} if params is None else params
+    if assembly:
+        missing = set(PARTS) - set(names)
+        if missing:
+            raise ValueError(f"Assembly needs all parts, missing: {sorted(missing)}")
+    if check_layout:
+        # Fail in milliseconds instead of after the 3D work
+        issues = validate(params.get("cols", COLS))
+        if issues:
+            raise ValueError("Invalid layout:\n  " + "\n  ".join(issues))
+
+    state = _load_state(out_dir)
+    keys = output_keys(names, params, formats, assembly, mesh_options, hands)
+    stale = [n for n in keys if not incremental or not _up_to_date(state.get(n), keys[n])]
+    for name in set(keys) - set(stale):
+        log.info(f'Up to date: "{name}"')
+    if not stale:
+        return {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        if not assembly:
+            # Parts are independent, so each worker builds and exports one,
+            # in both halves if asked to
+            futures = {
+                name: pool.submit(
+                    _in_worker, build_and_export, name, params, formats, out_dir,
+                    mesh_options, hands,
+                )
+                for name in stale
+            }
+        else:
+            # Joints need every part, so build in parallel, assemble here and
+            # export the placed parts in parallel again, while this process
+            # writes the combined assembly files. Mirroring the placed parts
+            # gives the other half's assembly.
+            import brep
+
+            futures = {
+                name: pool.submit(_in_worker, _build_brep, name, params)
+                for name in PARTS
+            }
+            parts = {name: brep.loads(_result(f)) for name, f in futures.items()}
+            assembled = assemble(parts)
+            placed = dict(zip(PARTS, assembled.children))
+            futures = {
+                name: pool.submit(
+                    _in_worker, _export_brep, brep.dumps(placed[name]), formats, out_dir,
+                    mesh_options, hands,
+                )
+                for name in stale if name != "assembly"
+            }
+            if "assembly" in stale:
+                combined = export_assembly_hands(
+                    assembled, formats, out_dir, mesh_options, hands
+                )
+        outputs = {name: _result(f) for name, f in futures.items()}
+        if "assembly" in stale:
+            outputs["assembly"] = combined
+
+    for name, paths in outputs.items():
+        if name in keys:
+            state[name] = {"key": keys[name], "outputs": paths}
+    _save_state(out_dir, state)
+    return outputs
+
+
+def parse_tessellation(text):
+    label, _, values = text.partition("=")
+    try:
+        linear, angular = (float(v) for v in values.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected LABEL=LINEAR,ANGULAR, got {text!r}")
+    return label, (linear, angular)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build and export the Corne case parts without a viewer"
+    )
+    parser.add_argument("--cols", type=int, default=COLS, choices=(5, 6))
+    parser.add_argument(
+        "--parts", nargs="+", default=list(PARTS), choices=list(PARTS),
+        help="parts to build (default: all)",
+    )
+    parser.add_argument(
+        "--formats", nargs="+", default=list(DEFAULT_FORMATS), choices=FORMATS,
+    )
+    parser.add_argument("-o", "--out-dir", default=".")
+    parser.add_argument(
+        "--quality", default=QUALITY, choices=(FINAL, DRAFT),
+        help="draft skips fillets/chamfers and key recesses and meshes coarsely",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--assembly", action="store_true",
+        help="connect the joints, export the parts in assembled position and the "
+        "whole assembly as one STEP/3MF file",
+    )
+    parser.add_argument(
+        "--hands", nargs="+", choices=HANDS,
+        help="export these halves, the other one is mirrored from the built parts "
+        "(default: the built half, unlabelled)",
+    )
+    parser.add_argument(
+        "--adaptive-mesh", action="store_true",
+        help="mesh curved faces finely and planar faces coarsely",
+    )
+    parser.add_argument(
+        "--mesh", dest="mesh_parts", type=parse_tessellation, action="append",
+        default=[], metavar="LABEL=LINEAR,ANGULAR",
+        help='mesh deflection for one part, e.g. "Cover=0.01,0.1"',
+    )
+    parser.add_argument(
+        "--serial-mesh", action="store_true",
+        help="don't mesh the faces of a part in parallel threads",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="only rebuild parts whose code, constants or arguments changed",
+    )
+    parser.add_argument(
+        "--force-export", action="store_true",
+        help="write every output, even if its geometry and settings match the last export",
+    )
+    parser.add_argument(
+        "--no-validate", action="store_true",
+        help="build even if the 2D layout check finds problems",
+    )
+    parser.add_argument(
+        "--profile", metavar="JSON",
+        help="write per-stage build times and shape complexity to this file",
+    )
+    parser.add_argument(
+        "--flame", metavar="FILE",
+        help="write the stage times as collapsed stacks (flamegraph.pl, speedscope)",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    set_quality(args.quality)
+    if args.force_export:
+        set_skip_unchanged(False)
+    profiler.enable(bool(args.profile or args.flame))
+    start = time.perf_counter()
+    mesh_options = {
+        "adaptive": args.adaptive_mesh,
+        "parallel": not args.serial_mesh,
+        "parts": dict(args.mesh_parts),
+    }
+    outputs = build(
+        args.parts, {"cols": args.cols}, args.formats, args.out_dir, args.jobs,
+        args.assembly, args.incremental, mesh_options, args.hands, not args.no_validate,
+    )
+    built = sum(name in PARTS for name in outputs)
+    log.info(f"Built {built} parts in {time.perf_counter() - start:.2f}s")
+    stats = memo.stats()
+    if stats["hits"] or stats["misses"]:
+        log.info(
+            f"Shared sketches and locations: {stats['hits']} reused, "
+            f"{stats['misses']} built ({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['seconds_saved']:.2f}s saved"
+        )
+    if args.profile:
+        profiler.write_json(args.profile)
+    if args.flame:
+        profiler.write_collapsed(args.flame)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,21 @@
 from build123d import *
 
+from cache import cached, memoized
 from cover import HULL_THICKNESS
+from profiler import mark, profiled
 
 C, MIN, MAX = Align.CENTER, Align.MIN, Align.MAX
 
 
+@memoized
+@profiled
+@cached
 class Button(Part):
-    def __init__(self, **kwargs):
-        tol_z = .1
-        tol_xy = .3
+    def __init__(self, tol_xy=.3, tol_z=.1, **kwargs):
         kwargs["label"] = kwargs.get("label", "Reset button")
         button = Box(2.7 - tol_xy, 0.3 + HULL_THICKNESS * 0.70 - tol_xy, 2.7 - tol_z, align=(C, MIN, MIN))
         button += Box(4.7 - tol_xy, 0.3 + HULL_THICKNESS * 0.30, 4.8 - tol_z, align=(C, MAX, MIN))
+        mark("body", button)
 
         joint_location = Location(Plane.XZ)
         joint = RigidJoint("joint", button, joint_location=joint_location)
@@ -0,0 +1,375 @@
+import argparse
+import copy
+import functools
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from importlib.metadata import version
+
+from deps import call_arguments, dependencies, digest
+from profiler import mark
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get(
+    "CORNE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "brep"),
+)
+CACHE_MAX_MB = float(os.environ.get("CORNE_CACHE_MAX_MB", 512))
+CACHE_ENABLED = os.environ.get("CORNE_CACHE", "1") != "0"
+MEMO_ENABLED = os.environ.get("CORNE_MEMO", "1") != "0"
+# Long-lived processes (daemon.py) keep this many results, least recently
+# used go first
+MEMO_MAX_ENTRIES = int(os.environ.get("CORNE_MEMO_MAX_ENTRIES", 64))
+# Bump when the on-disk format changes
+FORMAT_VERSION = 1
+EXT = ".brep"
+
+
+class BrepCache:
+    # On-disk store of built shapes, least recently used entries go first
+    def __init__(self, path=CACHE_DIR, max_bytes=CACHE_MAX_MB * 2**20, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = self.misses = 0
+
+    def key(self, cls, arguments):
+        # Changes with the arguments, the source of the class and everything it
+        # calls in this repo, and the module-level constants those read
+        return f"{cls.__qualname__}-" + digest(
+            FORMAT_VERSION,
+            version("build123d"),
+            cls.__module__,
+            cls.__qualname__,
+            sorted(arguments.items()),
+            dependencies(cls),
+        )
+
+    def _file(self, key):
+        return os.path.join(self.path, key + EXT)
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.path, n) for n in names if n.endswith(EXT)]
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return data
+
+    def has(self, key):
+        return os.path.exists(self._file(key))
+
+    def put(self, key, data):
+        os.makedirs(self.path, exist_ok=True)
+        # Write atomically, parallel workers may be storing the same key
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def invalidate(self, cls=None):
+        # Drop all entries, or only those of the given class (or class name),
+        # stage checkpoints included
+        name = getattr(cls, "__qualname__", cls)
+        removed = 0
+        for path in self._entries():
+            if name is None or os.path.basename(path).startswith((f"{name}-", f"{name}.")):
+                removed += self._remove(path)
+        return removed
+
+    def stats(self):
+        sizes = [os.path.getsize(p) for p in self._entries()]
+        return {
+            "path": self.path,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return 1
+
+
+cache = BrepCache(enabled=CACHE_ENABLED)
+
+
+def cached(cls):
+    # Class decorator for Part/Sketch/Curve builders: load the result from the
+    # cache instead of running __init__ when nothing it depends on changed
+    init = cls.__init__
+
+    @functools.wraps(init)
+    def __init__(self, *args, **kwargs):
+        # Subclasses have their own inputs, let them build normally
+        if not cache.enabled or type(self) is not cls:
+            return init(self, *args, **kwargs)
+
+        arguments = call_arguments(init, args, kwargs)
+        if any(" at 0x" in repr(v) for v in arguments.values()):
+            return init(self, *args, **kwargs)  # not a stable key
+
+        key = cache.key(cls, arguments)
+        data = cache.get(key)
+        import brep
+
+        if data is not None:
+            log.debug(f"Loaded {cls.__qualname__} from cache")
+            brep.loads(data, self)
+            mark("load from cache", self, part=cls.__qualname__)
+            return
+        init(self, *args, **kwargs)
+        cache.put(key, brep.dumps(self))
+
+    cls.__init__ = __init__
+    return cls
+
+
+def run_stages(builder, stages, arguments, attrs=()):
+    # Run the builder's stage methods in order, each on the result of the one
+    # before (the first on nothing), checkpointing every result in the cache.
+    # A stage's checkpoint is keyed by the builder's arguments and the code
+    # and constants of its __init__, the stage and all stages before it, so
+    # a rebuild resumes after the last stage whose inputs didn't change.
+    # `attrs` are builder attributes stages set for later ones.
+    if not cache.enabled:
+        result = None
+        for name in stages:
+            result = _run_stage(builder, name, result)
+        return result
+
+    import brep
+
+    cls = type(builder)
+    key = digest(
+        FORMAT_VERSION,
+        version("build123d"),
+        cls.__module__,
+        cls.__qualname__,
+        sorted(arguments.items()),
+        dependencies(cls.__init__),
+    )
+    keys = []
+    for name in stages:
+        key = digest(key, name, dependencies(getattr(cls, name)))
+        keys.append(f"{cls.__qualname__}.{name}-{key}")
+
+    result, done = None, 0
+    for i in range(len(stages), 0, -1):
+        # Only probe for misses, a get() counts them
+        data = cache.get(keys[i - 1]) if cache.has(keys[i - 1]) else None
+        if data is not None:
+            log.debug(f"Resuming {cls.__qualname__} after {stages[i - 1]}")
+            result, done = brep.loads_stage(data, builder), i
+            mark(f"load {stages[i - 1]}", result, part=cls.__qualname__)
+            break
+    for name, key in zip(stages[done:], keys[done:]):
+        result = _run_stage(builder, name, result)
+        cache.put(key, brep.dumps_stage(result, builder, attrs))
+    return result
+
+
+def _run_stage(builder, name, result):
+    method = getattr(builder, name)
+    return method() if result is None else method(result)
+
+
+class MemoCache:
+    # In-process store of the sketches, locations and parts built from the
+    # same arguments more than once, so each distinct one is built (or loaded
+    # from disk) once per process. Callers get their own copy of the stored
+    # result.
+    def __init__(self, enabled=True, max_entries=MEMO_MAX_ENTRIES):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.counts = {}
+
+    def key(self, cls, arguments):
+        # Sources don't change within a process, constants can be overridden
+        return (
+            cls.__module__,
+            cls.__qualname__,
+            repr(sorted(arguments.items())),
+            repr(dependencies(cls)["constants"]),
+        )
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, snapshot, seconds):
+        self._entries[key] = (snapshot, seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def count(self, name, hit, seconds):
+        # A hit saves the time the entry took to build, minus the copy
+        counts = self.counts.setdefault(
+            name, {"hits": 0, "misses": 0, "seconds_built": 0.0, "seconds_saved": 0.0}
+        )
+        counts["hits" if hit else "misses"] += 1
+        counts["seconds_saved" if hit else "seconds_built"] += seconds
+
+    def clear(self):
+        self._entries.clear()
+
+    def drain(self):
+        counts, self.counts = self.counts, {}
+        return counts
+
+    def merge(self, counts):
+        # Add the counts drained from another process
+        for name, other in counts.items():
+            mine = self.counts.setdefault(name, dict.fromkeys(other, 0))
+            for k, v in other.items():
+                mine[k] += v
+
+    def stats(self):
+        hits = sum(c["hits"] for c in self.counts.values())
+        misses = sum(c["misses"] for c in self.counts.values())
+        return {
+            "entries": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "seconds_saved": sum(c["seconds_saved"] for c in self.counts.values()),
+            "classes": self.counts,
+        }
+
+
+memo = MemoCache(enabled=MEMO_ENABLED)
+
+
+def _copied(wrapped):
+    # A deep copy without the mesh. Meshing, booleans (pcurves, tolerances)
+    # and relocating all change a shape in place, so the stored shape and
+    # the callers' ones share nothing.
+    from build123d.topology import downcast
+    from OCP.BRepBuilderAPI import BRepBuilderAPI_Copy
+
+    return downcast(BRepBuilderAPI_Copy(wrapped, True, False).Shape())
+
+
+def _snapshot(obj):
+    from build123d.build_common import LocationList
+
+    if isinstance(obj, LocationList):
+        return [copy.copy(loc) for loc in obj.local_locations]
+    import brep
+
+    state = brep.state(obj)
+    state["wrapped"] = _copied(state["wrapped"])
+    return state
+
+
+def _restore(snapshot, obj):
+    from build123d.build_common import LocationList
+
+    if isinstance(obj, LocationList):
+        LocationList.__init__(obj, [copy.copy(loc) for loc in snapshot])
+        return
+    import brep
+
+    brep.from_state({**snapshot, "wrapped": _copied(snapshot["wrapped"])}, obj)
+
+
+def memoized(cls):
+    # Class decorator for sketch, curve and location builders used by several
+    # parts, and for the parts: reuse the result built earlier in this process
+    # for the same arguments and constants. Goes above @profiled and @cached.
+    init = cls.__init__
+
+    @functools.wraps(init)
+    def __init__(self, *args, **kwargs):
+        from build123d.build_common import LocationList
+
+        # Locations within a builder's Locations() are relative to it
+        if (
+            not memo.enabled
+            or type(self) is not cls
+            or (isinstance(self, LocationList) and LocationList._get_context())
+        ):
+            return init(self, *args, **kwargs)
+
+        arguments = call_arguments(init, args, kwargs)
+        if any(" at 0x" in repr(v) for v in arguments.values()):
+            return init(self, *args, **kwargs)  # not a stable key
+
+        key = memo.key(cls, arguments)
+        start = time.perf_counter()
+        entry = memo.get(key)
+        if entry is not None:
+            snapshot, seconds = entry
+            _restore(snapshot, self)
+            memo.count(cls.__qualname__, True, seconds - (time.perf_counter() - start))
+            return
+        init(self, *args, **kwargs)
+        seconds = time.perf_counter() - start
+        memo.put(key, _snapshot(self), seconds)
+        memo.count(cls.__qualname__, False, seconds)
+
+    cls.__init__ = __init__
+    return cls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the BREP build cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    sub.add_parser("clear")
+    invalidate = sub.add_parser("invalidate")
+    invalidate.add_argument("classes", nargs="+", help="e.g. Cover KeyPlateSketch")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        for k, v in cache.stats().items():
+            print(f"{k}: {v}")
+    elif args.command == "clear":
+        print(f"Removed {cache.invalidate()} entries")
+    else:
+        removed = sum(cache.invalidate(name) for name in args.classes)
+        print(f"Removed {removed} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import itertools
+import json
+import logging
+import time
+
+import numpy as np
+
+from build import COLS, PARTS, build_part, setup_logging
+from export import face_triangles, mesh
+
+log = logging.getLogger(__name__)
+
+# Tessellation for the checks as (absolute linear mm, angular rad), fine
+# enough for the 0.1-0.3 mm fit tolerances
+CHECK_TESSELLATION = (0.01, 0.2)
+# Gaps wider than this are reported as clear without measuring them
+REPORT_DISTANCE = 1.0
+# Closer than this is contact (flush faces), deeper is interference
+CONTACT_TOLERANCE = 1e-3
+# Switch positions checked across the switch_slide joint's range
+SLIDE_STEPS = 5
+LEAF_SIZE = 8
+
+
+def _spread_bits(values):
+    # 10 bit integers -> every third bit, for 30 bit Morton codes
+    values = values.astype(np.uint32) & 0x3FF
+    values = (values | (values << 16)) & 0x030000FF
+    values = (values | (values << 8)) & 0x0300F00F
+    values = (values | (values << 4)) & 0x030C30C3
+    return (values | (values << 2)) & 0x09249249
+
+
+def _morton_order(points):
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    cells = (points - lo) / np.maximum(hi - lo, 1e-12) * 1023
+    codes = (
+        (_spread_bits(cells[:, 0]) << 2)
+        | (_spread_bits(cells[:, 1]) << 1)
+        | _spread_bits(cells[:, 2])
+    )
+    return np.argsort(codes, kind="stable")
+
+
+def _dot(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+def point_triangle_distance(points, corners):
+    # Distance from each point to the triangle (3, 3) in the same row,
+    # closest point by Voronoi region (Ericson, Real-Time Collision Detection)
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    ab, ac = b - a, c - a
+    ap, bp, cp = points - a, points - b, points - c
+    d1, d2 = _dot(ab, ap), _dot(ac, ap)
+    d3, d4 = _dot(ab, bp), _dot(ac, bp)
+    d5, d6 = _dot(ab, cp), _dot(ac, cp)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # From the interior towards the vertices, later regions win
+        denom = va + vb + vc
+        closest = a + ab * (vb / denom)[:, None] + ac * (vc / denom)[:, None]
+        regions = [
+            (
+                (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0),
+                b + (c - b) * ((d4 - d3) / ((d4 - d3) + (d5 - d6)))[:, None],
+            ),
+            ((vb <= 0) & (d2 >= 0) & (d6 <= 0), a + ac * (d2 / (d2 - d6))[:, None]),
+            ((d6 >= 0) & (d5 <= d6), c),
+            ((vc <= 0) & (d1 >= 0) & (d3 <= 0), a + ab * (d1 / (d1 - d3))[:, None]),
+            ((d3 >= 0) & (d4 <= d3), b),
+            ((d1 <= 0) & (d2 <= 0), a),
+        ]
+        for mask, point in regions:
+            closest = np.where(mask[:, None], point, closest)
+    return np.linalg.norm(points - closest, axis=1)
+
+
+class TriangleBVH:
+    # Bounding volume hierarchy over a triangle soup: triangles sorted along
+    # a Morton curve, LEAF_SIZE per leaf box, and each level above pairing up
+    # the boxes of the one below
+    def __init__(self, corners, leaf_size=LEAF_SIZE):
+        self.corners = corners[_morton_order(corners.mean(axis=1))]
+        self.leaf_size = leaf_size
+        starts = np.arange(0, len(self.corners), leaf_size)
+        lo = np.minimum.reduceat(self.corners.min(axis=1), starts)
+        hi = np.maximum.reduceat(self.corners.max(axis=1), starts)
+        self.levels = [(lo, hi)]
+        while len(lo) > 1:
+            if len(lo) % 2:
+                lo, hi = np.concatenate([lo, lo[-1:]]), np.concatenate([hi, hi[-1:]])
+            lo = np.minimum(lo[0::2], lo[1::2])
+            hi = np.maximum(hi[0::2], hi[1::2])
+            self.levels.append((lo, hi))
+
+    def distance(self, points, limit):
+        # Distance from each point to the closest triangle, inf beyond `limit`.
+        # All points descend the tree together, dropping boxes out of reach.
+        best = np.full(len(points), np.inf)
+        point_ids = np.arange(len(points))
+        node_ids = np.zeros(len(points), dtype=int)
+        for depth in range(len(self.levels) - 1, -1, -1):
+            lo, hi = self.levels[depth]
+            p = points[point_ids]
+            gap = np.maximum(np.maximum(lo[node_ids] - p, p - hi[node_ids]), 0)
+            near = _dot(gap, gap) <= limit ** 2
+            point_ids, node_ids = point_ids[near], node_ids[near]
+            if depth:
+                children = len(self.levels[depth - 1][0])
+                point_ids = np.repeat(point_ids, 2)
+                node_ids = (node_ids[:, None] * 2 + [0, 1]).ravel()
+                valid = node_ids < children
+                point_ids, node_ids = point_ids[valid], node_ids[valid]
+
+        point_ids = np.repeat(point_ids, self.leaf_size)
+        triangle_ids = (node_ids[:, None] * self.leaf_size + np.arange(self.leaf_size)).ravel()
+        valid = triangle_ids < len(self.corners)
+        point_ids, triangle_ids = point_ids[valid], triangle_ids[valid]
+        distances = point_triangle_distance(points[point_ids], self.corners[triangle_ids])
+        np.minimum.at(best, point_ids, distances)
+        best[best > limit] = np.inf
+        return best
+
+
+class PartMesh:
+    # A placed part tessellated once: its vertices, a BVH over its triangles
+    # and a classifier for points inside the solid
+    def __init__(self, part, tessellation=CHECK_TESSELLATION):
+        from OCP.BRepClass3d import BRepClass3d_SolidClassifier
+
+        self.label = part.label
+        mesh(part, *tessellation, False)
+        corners = np.concatenate([nodes[tris] for nodes, tris in face_triangles(part)])
+        # Zero area triangles from the mesher have nothing to project onto
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        corners = corners[np.linalg.norm(normals, axis=1) > 1e-12]
+        self.points = np.unique(corners.reshape(-1, 3), axis=0)
+        self.bounds = corners.min(axis=(0, 1)), corners.max(axis=(0, 1))
+        self.bvh = TriangleBVH(corners)
+        self._classifier = BRepClass3d_SolidClassifier(part.wrapped)
+
+    def inside(self, points):
+        from OCP.gp import gp_Pnt
+        from OCP.TopAbs import TopAbs_IN
+
+        states = []
+        for x, y, z in points.tolist():
+            self._classifier.Perform(gp_Pnt(x, y, z), CONTACT_TOLERANCE)
+            states.append(self._classifier.State() == TopAbs_IN)
+        return np.array(states, dtype=bool)
+
+
+def _penetration(points, other, distances):
+    # Deepest of `points` inside `other`, given their distances to its surface
+    candidates = np.isfinite(distances) & (distances > CONTACT_TOLERANCE)
+    inside = np.zeros(len(points), dtype=bool)
+    inside[candidates] = other.inside(points[candidates])
+    return distances[inside].max() if inside.any() else 0.0, int(inside.sum())
+
+
+def check_pair(a, b, offset=(0, 0, 0), limit=REPORT_DISTANCE):
+    # Clearance between two part meshes with `b` moved by `offset`, measured
+    # from each one's vertices to the other's triangles. Gaps and penetration
+    # depths are only measured up to `limit`.
+    offset = np.asarray(offset, dtype=float)
+    gap = np.maximum(
+        np.maximum(a.bounds[0] - (b.bounds[1] + offset), (b.bounds[0] + offset) - a.bounds[1]),
+        0,
+    )
+    result = {"parts": [a.label, b.label], "clearance": None, "penetration": 0.0, "points": 0}
+    if np.linalg.norm(gap) > limit:
+        return result
+
+    a_points, b_points = a.points - offset, b.points + offset
+    a_to_b = b.bvh.distance(a_points, limit)
+    b_to_a = a.bvh.distance(b_points, limit)
+    clearance = min(a_to_b.min(initial=np.inf), b_to_a.min(initial=np.inf))
+    if np.isfinite(clearance):
+        result["clearance"] = float(clearance)
+
+    depth_a, count_a = _penetration(a_points, b, a_to_b)
+    depth_b, count_b = _penetration(b_points, a, b_to_a)
+    result["penetration"] = float(max(depth_a, depth_b))
+    result["points"] = count_a + count_b
+    return result
+
+
+def status(result):
+    if result["penetration"] > CONTACT_TOLERANCE:
+        return "interference"
+    if result["clearance"] is not None and result["clearance"] <= CONTACT_TOLERANCE:
+        return "contact"
+    return "clear"
+
+
+def slide_offsets(assembly, steps=SLIDE_STEPS):
+    # Switch displacement at `steps` positions across its slide, relative to
+    # where the assembly puts it
+    start = assembly.placements["switch"].position
+    low, high = assembly.parts["cover"].joints["switch_slide"].linear_range
+    offsets = []
+    for position in np.linspace(low, high, steps):
+        assembly.pose(switch_position=float(position))
+        offsets.append((float(position), tuple(assembly.placements["switch"].position - start)))
+    assembly.pose()
+    return offsets
+
+
+def check_parts(parts, slide_steps=SLIDE_STEPS, limit=REPORT_DISTANCE):
+    # Clearances between every pair of assembled parts, the switch across
+    # its whole slide. `parts` are built, unplaced parts by name.
+    from assembly import Assembly
+
+    assembly = Assembly(parts)
+    meshes = {name: PartMesh(assembly.placed(name)) for name in parts}
+    slide = slide_offsets(assembly, slide_steps)
+
+    results = []
+    for a, b in itertools.combinations(parts, 2):
+        positions = [(None, (0, 0, 0))]
+        if "switch" in (a, b):
+            positions = slide
+        for position, offset in positions:
+            if a == "switch":
+                offset = tuple(-v for v in offset)
+            result = check_pair(meshes[a], meshes[b], offset, limit)
+            result["switch_position"] = position
+            result["status"] = status(result)
+            results.append(result)
+    return results
+
+
+def check(params=None, slide_steps=SLIDE_STEPS, limit=REPORT_DISTANCE):
+    # The parts' own `cols` defaults differ, they only fit with the same one
+    params = {"cols": COLS, **(params or {})}
+    parts = {name: build_part(name, params) for name in PARTS}
+    return check_parts(parts, slide_steps, limit)
+
+
+def _severity(result):
+    clearance = result["clearance"]
+    return result["penetration"], -(np.inf if clearance is None else clearance)
+
+
+def summary(results):
+    # Worst placement per pair of parts, e.g. for a sweep manifest
+    worst = {}
+    for result in results:
+        key = " / ".join(result["parts"])
+        if key not in worst or _severity(result) > _severity(worst[key]):
+            worst[key] = result
+    return worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check clearances and interferences between the assembled parts"
+    )
+    parser.add_argument("--cols", type=int, default=COLS, choices=(5, 6))
+    parser.add_argument("--slide-steps", type=int, default=SLIDE_STEPS)
+    parser.add_argument(
+        "--limit", type=float, default=REPORT_DISTANCE,
+        help="report gaps up to this distance (mm)",
+    )
+    parser.add_argument("--json", metavar="FILE", help="write all results to this file")
+    parser.add_argument(
+        "--strict", action="store_true", help="exit with an error on interference",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    start = time.perf_counter()
+    results = check({"cols": args.cols}, args.slide_steps, args.limit)
+    log.info(f"Checked {len(results)} placements in {time.perf_counter() - start:.2f}s")
+
+    for result in results:
+        if result["clearance"] is None and not result["penetration"]:
+            continue
+        position = result["switch_position"]
+        clearance = result["clearance"]
+        print(
+            f"{' / '.join(result['parts']):<40}"
+            f"{'' if position is None else f'slide {position:+.2f}':>12}"
+            f"{'' if clearance is None else f'{clearance:.3f}mm':>10}"
+            f"{result['penetration']:>8.3f}mm  {result['status']}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.strict and any(r["status"] == "interference" for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from build123d import *
 
+from cache import cached, memoized, run_stages
 from corne_board import (
     BasePlateSketch,
     MCCoverScrewLocations,
@@ -9,66 +10,78 @@ from corne_board import (
     RESET_BUTTON_Y_POS,
 )
 from mc_cover import MCCoverCutoutSketch, MCCoverSketch
-from params import THICKNESS, FR, HULL_THICKNESS
+from params import THICKNESS, FR, HULL_THICKNESS, is_draft
+from profiler import profiled, stage
+from utils import batch_cut, convex_corners, vertex_edges
 
 C, MIN, MAX = Align.CENTER, Align.MIN, Align.MAX
 
 
+@memoized
+@profiled
+@cached
 class Cover(Part):
+    # Each stage works on the result of the one before, the switch and button
+    # holes last so moving them resumes from the checkpoint before them
+    STAGES = [
+        "make_base_sk",
+        "base_part",
+        "cut_inset",
+        "add_keys",
+        "cut_display",
+        "add_screw_holes",
+        "add_switch_hole",
+        "add_button_hole",
+    ]
+
     def __init__(self, cols=5, **kwargs):
         kwargs["label"] = kwargs.get("label", "Cover")
         self.cols = cols
-        self._base_plate_sk = BasePlateSketch(
-            cols=self.cols, do_fillet=False, screw_radius=0
-        )
         self.joints = {}
 
-        sk = self.make_base_sk()
-        part = self.base_part(sk)
-        part = self.cut_inset(part)
-        part = self.add_keys(part)
-        part = self.cut_display(part)
-        part = self.add_screw_holes(part)
-        part = self.add_switch_hole(part)
-        part = self.add_button_hole(part)
+        part = run_stages(
+            self, self.STAGES, {"cols": cols}, attrs=("_inset_plane", "_switch_plane")
+        )
 
         self.add_bottom_joint(part)
         self.add_mc_cover_joint(part)
 
         super().__init__(part.wrapped, joints=self.joints, **kwargs)
 
+    @stage
     def make_base_sk(self):
-        # Thicken by FR, then round corners by same amount
-        cover_sk = offset(self._base_plate_sk, HULL_THICKNESS, kind=Kind.INTERSECTION)
+        # Thicken by FR, then round corners by same amount. The base plate
+        # sketch is made where needed rather than kept on the part (shared,
+        # so cheap to make again)
+        base_plate_sk = BasePlateSketch(cols=self.cols, do_fillet=False, screw_radius=0)
+        cover_sk = offset(base_plate_sk, HULL_THICKNESS, kind=Kind.INTERSECTION)
+        if is_draft():
+            return cover_sk
 
         # Round out corners
-        fillet_vertices = []
-        for v in cover_sk.vertices():
-            edges = [e for e in cover_sk.edges() if v in e.vertices()]
-            if all(e.length > FR for e in edges):
-                fillet_vertices.append(v)
-        orig_vertices = cover_sk.vertices()
+        edges = vertex_edges(cover_sk)
+        vertices = cover_sk.vertices()
+        fillet_vertices = [v for v in vertices if all(e.length > FR for e in edges[v])]
         cover_sk = fillet(fillet_vertices, FR)
-        unfilleted_vertices = cover_sk.vertices() - (
-            cover_sk.vertices() - orig_vertices
-        )
 
-        # FIXME: find a way to only select "outer" corners, this can break easily
-        unfilleted_vertices = unfilleted_vertices.sort_by(Axis.Y).sort_by(Axis.X)
-        outer_vertices = ShapeList([unfilleted_vertices[i] for i in (0, 3, 5)])
-        cover_sk = fillet(outer_vertices, 2.3)
+        # Round the outer ones of the corners left, a little less
+        original = set(vertices)
+        vertices = [v for v in cover_sk.vertices() if v in original]
+        cover_sk = fillet(convex_corners(cover_sk, vertices), 2.3)
 
         return cover_sk
 
+    @stage
     def base_part(self, cover_sk):
         # Extrude into 3D shape
         part = extrude(cover_sk, THICKNESS)
 
         # fillet top and bottom faces
-        bottom = part.edges().group_by(Axis.Z)[0]
-        part = fillet(bottom, HULL_THICKNESS)
-        top = part.edges().group_by(Axis.Z)[-1]
-        part = fillet(top, HULL_THICKNESS)
+        if not is_draft():
+            bottom = part.edges().group_by(Axis.Z)[0]
+            part = fillet(bottom, HULL_THICKNESS)
+            top = part.edges().group_by(Axis.Z)[-1]
+            part = fillet(top, HULL_THICKNESS)
 
         # Add the MC window shape to the overall shape
         sk = MCCoverSketch()
@@ -76,38 +89,46 @@ class Cover(Part):
 
         return part
 
+    @stage
     def cut_inset(self, part):
         # Cut the board inset
         top = part.faces().sort_by(Axis.Z).sort_by(SortBy.AREA)[-2]
-        inset_sk = Plane((0, 0, top.center().Z)) * self._base_plate_sk
+        base_plate_sk = BasePlateSketch(cols=self.cols, do_fillet=False, screw_radius=0)
+        inset_sk = Plane((0, 0, top.center().Z)) * base_plate_sk
         part -= extrude(inset_sk, -4.5)
         inner_face = part.faces().filter_by(Axis.Z).group_by(SortBy.AREA)[-2].sort_by(Axis.Z).first
         self._inset_plane = Plane((0, 0, inner_face.center().Z))
         return part
 
+    @stage
     def add_keys(self, part):
-        # Cut out key holes (inset)
+        # Cut out key holes (inset), in draft without the recess around them
         key_locations = self._inset_plane * KeyLocations(cols=self.cols)
-        part -= key_locations * extrude(Rectangle(15.5, 15.5, align=(C, C)), -0.8)
-        part -= key_locations * extrude(Rectangle(13.5, 13.7, align=(C, C)), -2.1)
-        return part
+        holes = [extrude(Rectangle(13.5, 13.7, align=(C, C)), -2.1)]
+        if not is_draft():
+            holes.insert(0, extrude(Rectangle(15.5, 15.5, align=(C, C)), -0.8))
+        return batch_cut(part, key_locations, *holes)
 
+    @stage
     def cut_display(self, part):
         # Cut out MC display hole
         sk = MCCoverCutoutSketch()
         part -= extrude(sk, THICKNESS)
         return part
 
+    @stage
     def add_screw_holes(self, part):
-        # Add screw holes
-        part -= (
+        # Add screw holes, both sets in one boolean
+        screw_holes = (
             self._inset_plane
             * ScrewLocations(cols=self.cols)
             * CounterBoreHole(1.2, 2.15, 0.8, THICKNESS / 2)
         )
-        part -= MCCoverScrewLocations() * extrude(Circle(1.2), THICKNESS)
+        mc_screw_holes = MCCoverScrewLocations() * extrude(Circle(1.2), THICKNESS)
+        part -= Compound([*screw_holes, *mc_screw_holes])
         return part
 
+    @stage
     def add_switch_hole(self, part):
         # Reference position based on the MC cover screw locations
         top_face = part.faces().group_by(Axis.Z)[0]
@@ -120,12 +141,15 @@ class Cover(Part):
         self._switch_plane = plane = Plane(pos, x_dir=(0, 1, 0), z_dir=(1, 0, 0))
 
         overhang = 0.3
-        part -= plane * Box(slide_range * 2, height, HULL_THICKNESS, align=(C, MIN, MAX))
         slide_area = Pos(0, 0, overhang * 2) * Box(
             width, height, overhang + 0.01 + depth, align=(C, MIN, MAX)
         )
-        part -= plane * slide_area
-        part -= plane * Box(slide_range * 2, height * 2, depth, align=(C, MIN, MAX))
+        # One boolean for the three (overlapping) boxes
+        part -= [
+            plane * Box(slide_range * 2, height, HULL_THICKNESS, align=(C, MIN, MAX)),
+            plane * slide_area,
+            plane * Box(slide_range * 2, height * 2, depth, align=(C, MIN, MAX)),
+        ]
 
         # Add the linear joint for the switch part to connect to
         joint_axis = Axis(pos - Vector(depth, 0, 0), (0, 1, 0))
@@ -135,13 +159,16 @@ class Cover(Part):
 
         return part
 
+    @stage
     def add_button_hole(self, part):
         # Set relative to the switch plane
         pos = self._switch_plane.location.position
         pos.Y = RESET_BUTTON_Y_POS
         plane = Plane(pos, x_dir=(0, 1, 0), z_dir=(1, 0, 0))
-        part -= plane * Box(2.7, 2.7, HULL_THICKNESS, align=(C, MIN, MAX))
-        part -= plane * Box(4.7, 5.4, 0.01 + HULL_THICKNESS * 0.3, align=(C, MIN, MAX))
+        part -= [
+            plane * Box(2.7, 2.7, HULL_THICKNESS, align=(C, MIN, MAX)),
+            plane * Box(4.7, 5.4, 0.01 + HULL_THICKNESS * 0.3, align=(C, MIN, MAX)),
+        ]
         joint_plane = Plane(
             pos - Vector(HULL_THICKNESS * 0.3, 0, 0), x_dir=(0, 1, 0), z_dir=(1, 0, 0)
         )
@@ -0,0 +1,348 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from build import COLS, PARTS, build_part, export_hands, load_class, setup_logging
+from cache import cache, memo
+from deps import overrides
+from export import DEFAULT_FORMATS, FORMATS
+from memory import current_rss, release
+from params import HANDS
+from profiler import profiler
+from sweep import SHARED, split_params
+from validate import validate
+
+log = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+PORT = 8765
+# Jobs waiting for a free worker on top of the running ones, more are turned
+# away with 503 until some finish
+MAX_QUEUED = 8
+# Finished jobs kept for GET /jobs/ID, oldest go first
+JOB_HISTORY = 1000
+# Longest ?wait= on GET /jobs/ID, in seconds, longer ones are cut to this
+MAX_WAIT = 60
+
+
+# In the worker processes. They stay up between jobs, so the kernel is loaded
+# once and the memo keeps the shared sketches, locations and built parts of
+# earlier jobs.
+def _warm():
+    setup_logging(logging.WARNING)
+    for path in PARTS.values():
+        load_class(path)
+    for path, names, fixed in SHARED:
+        load_class(path)(**{**{n: COLS for n in names}, **fixed})
+
+
+def _ready():
+    return True
+
+
+def run_job(job):
+    constants, arguments = split_params(job["params"])
+    start = time.time()
+    parts = {}
+    with overrides(constants):
+        if job["validate"]:
+            issues = validate(arguments.get("cols", COLS))
+            if issues:
+                raise ValueError("Invalid layout:\n  " + "\n  ".join(issues))
+        for name in job["parts"]:
+            built = time.perf_counter()
+            part = build_part(name, arguments)
+            exported = time.perf_counter()
+            outputs = export_hands(part, job["formats"], job["out_dir"], hands=job["hands"])
+            parts[name] = {
+                "build_seconds": exported - built,
+                "export_seconds": time.perf_counter() - exported,
+                "outputs": outputs,
+            }
+    profiler.drain()
+    # The parts are exported, only the memo's copies should stay
+    part = None
+    release()
+    result = {"started": start, "finished": time.time(), "parts": parts, "rss": current_rss()}
+    return result, memo.drain()
+
+
+def parse_job(body):
+    # A job as posted: {"parts": [...], "params": {"cols": 5, "THICKNESS": 7},
+    # "formats": [...], "out_dir": "...", "hands": [...], "validate": true}
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    unknown = set(body) - {"parts", "params", "formats", "out_dir", "hands", "validate"}
+    if unknown:
+        raise ValueError(f"Unknown field(s) {sorted(unknown)}")
+    if not isinstance(body.get("params", {}), dict):
+        raise ValueError("params must be an object")
+    job = {
+        "parts": body.get("parts", list(PARTS)),
+        "params": {"cols": COLS, **body.get("params", {})},
+        "formats": body.get("formats", list(DEFAULT_FORMATS)),
+        "out_dir": body.get("out_dir", "."),
+        "hands": body.get("hands"),
+        "validate": body.get("validate", True),
+    }
+    for field, choices in (("parts", PARTS), ("formats", FORMATS), ("hands", HANDS)):
+        values = job[field] or []
+        if not isinstance(values, list) or set(values) - set(choices):
+            raise ValueError(f"{field} must be a list of {sorted(choices)}")
+    return job
+
+
+def parse_wait(query):
+    # Seconds a GET /jobs/ID may wait for the job to finish
+    try:
+        wait = float(query.get("wait", ["0"])[0])
+    except ValueError:
+        raise ValueError("wait must be a number of seconds")
+    if not wait >= 0:
+        raise ValueError("wait must be a number of seconds")
+    return min(wait, MAX_WAIT)
+
+
+class Scheduler:
+    # Runs jobs on a fixed pool of warm worker processes. Only as many jobs
+    # as there are workers plus MAX_QUEUED are accepted at a time.
+    def __init__(self, workers, max_queued=MAX_QUEUED):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm)
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.jobs = {}
+        self._pending = {}
+        # One task per worker starts them all now rather than on the first jobs
+        for f in [self.pool.submit(_ready) for _ in range(workers)]:
+            f.result()
+
+    def submit(self, job):
+        # The job's record, or None when the queue is full
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            id = str(next(self._ids))
+            record = {"id": id, "status": "queued", "submitted": time.time(), "job": job}
+            self.jobs[id] = record
+            self._pending[id] = threading.Event()
+            future = self.pool.submit(run_job, job)
+        future.add_done_callback(lambda f: self._finished(id, f))
+        return record
+
+    def _finished(self, id, future):
+        record = self.jobs[id]
+        try:
+            result, memo_counts = future.result()
+        except Exception as e:
+            record.update(status="failed", error=f"{type(e).__name__}: {e}")
+            record["finished"] = time.time()
+            log.warning(f"Job {id} failed: {record['error']}")
+        else:
+            memo.merge(memo_counts)
+            record.update(
+                status="done",
+                parts=result["parts"],
+                finished=result["finished"],
+                queue_seconds=result["started"] - record["submitted"],
+                run_seconds=result["finished"] - result["started"],
+                worker_rss=result["rss"],
+            )
+            log.info(f"Job {id} done in {record['run_seconds']:.2f}s")
+        with self._lock:
+            self._pending.pop(id).set()
+            done = [i for i in self.jobs if i not in self._pending]
+            for old in done[:-JOB_HISTORY]:
+                del self.jobs[old]
+        self._slots.release()
+
+    def wait(self, id, timeout):
+        # The job's record once it has finished or after `timeout` seconds
+        finished = self._pending.get(id)
+        if finished is not None:
+            finished.wait(timeout)
+        return self.jobs.get(id)
+
+    def status(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "workers": self.workers,
+            "pending": pending,
+            "jobs": len(self.jobs),
+            "memo": memo.stats(),
+            "cache": cache.stats(),
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    # POST /jobs          queue a job, 202 with its record, 503 when full
+    # GET  /jobs/ID       its status, outputs and timing (?wait=SECONDS)
+    # GET  /status        pending jobs, memo and BREP cache statistics
+    scheduler = None
+
+    def _send(self, code, body, headers=()):
+        data = json.dumps(body, indent=2).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/status":
+            return self._send(200, self.scheduler.status())
+        if url.path.startswith("/jobs/"):
+            id = url.path[len("/jobs/"):]
+            try:
+                wait = parse_wait(query)
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            record = self.scheduler.wait(id, wait) if wait else self.scheduler.jobs.get(id)
+            if record is None:
+                return self._send(404, {"error": f"No job {id}"})
+            return self._send(200, record)
+        self._send(404, {"error": f"No resource {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            return self._send(404, {"error": f"No resource {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = parse_job(json.loads(self.rfile.read(length) or b"{}"))
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        record = self.scheduler.submit(job)
+        if record is None:
+            return self._send(503, {"error": "Queue full"}, [("Retry-After", "1")])
+        self._send(202, record, [("Location", f"/jobs/{record['id']}")])
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+def serve(host=HOST, port=PORT, workers=2, max_queued=MAX_QUEUED):
+    scheduler = Scheduler(workers, max_queued)
+    handler = type("Handler", (Handler,), {"scheduler": scheduler})
+    server = ThreadingHTTPServer((host, port), handler)
+    log.info(f"Serving on http://{host}:{server.server_port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.shutdown()
+
+
+def _request(url, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(
+        url, data, {"Content-Type": "application/json"} if data else {}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def submit(job, url=f"http://{HOST}:{PORT}", wait=True, retries=60):
+    # Post a job, retrying while the queue is full, and with `wait` poll
+    # until it has finished
+    for _ in range(retries):
+        code, record = _request(f"{url}/jobs", job)
+        if code != 503:
+            break
+        time.sleep(1)
+    if code != 202:
+        raise RuntimeError(record.get("error", f"HTTP {code}"))
+    while wait and record["status"] == "queued":
+        code, record = _request(f"{url}/jobs/{record['id']}?wait=30")
+    return record
+
+
+def parse_param(text):
+    # "THICKNESS=7" -> ("THICKNESS", 7)
+    from sweep import parse_axis
+
+    name, values = parse_axis(text)
+    if len(values) != 1:
+        raise argparse.ArgumentTypeError(f"Expected one value, got {text!r}")
+    return name, values[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Keep workers with the CAD kernel and caches warm, and build "
+        "and export jobs posted to a local HTTP API"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    server = sub.add_parser("serve", help="run the build server")
+    server.add_argument("--host", default=HOST)
+    server.add_argument("--port", type=int, default=PORT)
+    server.add_argument("-j", "--jobs", type=int, default=2, help="worker processes")
+    server.add_argument("--max-queued", type=int, default=MAX_QUEUED)
+    client = sub.add_parser("submit", help="send a job to a running server")
+    client.add_argument("--url", default=f"http://{HOST}:{PORT}")
+    client.add_argument("--parts", nargs="+", default=list(PARTS), choices=list(PARTS))
+    client.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS), choices=FORMATS)
+    client.add_argument("--hands", nargs="+", choices=HANDS)
+    client.add_argument(
+        "--set", dest="params", type=parse_param, action="append", default=[],
+        metavar="NAME=VALUE",
+        help="part argument (cols=5) or UPPER_CASE constant override (THICKNESS=7)",
+    )
+    client.add_argument("-o", "--out-dir", default=".")
+    client.add_argument("--no-validate", action="store_true")
+    client.add_argument("--no-wait", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        setup_logging()
+        serve(args.host, args.port, args.jobs, args.max_queued)
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    job = {
+        "parts": args.parts,
+        "params": dict(args.params),
+        "formats": args.formats,
+        "out_dir": os.path.abspath(args.out_dir),
+        "hands": args.hands,
+        "validate": not args.no_validate,
+    }
+    record = submit(job, args.url, wait=not args.no_wait)
+    if record["status"] == "failed":
+        print(record["error"])
+        raise SystemExit(1)
+    if record["status"] == "queued":
+        print(f"Queued job {record['id']}")
+        return
+    for name, part in record["parts"].items():
+        print(
+            f"{name:<10}{part['build_seconds']:>7.2f}s build{part['export_seconds']:>7.2f}s export"
+            f"  {' '.join(part['outputs'])}"
+        )
+    print(f"Job {record['id']}: {record['queue_seconds']:.2f}s queued, {record['run_seconds']:.2f}s run")
+
+
+if __name__ == "__main__":
+    main()
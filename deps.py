@@ -0,0 +1,151 @@
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import types
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _in_repo(module):
+    path = getattr(module, "__file__", None)
+    return path is not None and os.path.dirname(os.path.abspath(path)) == ROOT
+
+
+def is_local(obj):
+    # Defined in one of this repo's modules (not build123d, stdlib, ...)
+    return _in_repo(sys.modules.get(getattr(obj, "__module__", None) or ""))
+
+
+def _code_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _functions(obj):
+    if not inspect.isclass(obj):
+        return [inspect.unwrap(obj)]
+    functions = []
+    for value in vars(obj).values():
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        if isinstance(value, property):
+            functions += [f for f in (value.fget, value.fset) if f]
+        elif inspect.isfunction(value):
+            functions.append(inspect.unwrap(value))
+    return functions
+
+
+def _owner(function):
+    # The local class a method is defined in, None for plain functions
+    path = function.__qualname__.split(".")[:-1]
+    if not path or "<locals>" in path:
+        return None
+    owner = sys.modules[function.__module__]
+    for name in path:
+        owner = getattr(owner, name, None)
+    return owner if inspect.isclass(owner) else None
+
+
+def _member(cls, name):
+    # `name` as a local class' own function, property or nested class,
+    # looked up without binding (what `self.name` runs)
+    for klass in cls.__mro__:
+        if is_local(klass) and name in vars(klass):
+            value = vars(klass)[name]
+            if isinstance(value, (staticmethod, classmethod)):
+                value = value.__func__
+            if isinstance(value, property):
+                value = value.fget
+            if inspect.isfunction(value) or inspect.isclass(value):
+                return value
+            return None
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _walk(obj):
+    # Source hashes of every local class/function reachable from `obj` and the
+    # (module, name) of each module-level constant they read
+    sources, constants = {}, set()
+    todo = [obj]
+    while todo:
+        obj = todo.pop()
+        qualname = f"{obj.__module__}.{obj.__qualname__}"
+        if qualname in sources:
+            continue
+        source = inspect.getsource(obj)
+        sources[qualname] = hashlib.sha256(source.encode()).hexdigest()
+
+        if inspect.isclass(obj):
+            todo += [base for base in obj.__bases__ if is_local(base)]
+        module_globals = vars(sys.modules[obj.__module__])
+        # Methods reach the others of their class through `self.`
+        owner = obj if inspect.isclass(obj) else _owner(inspect.unwrap(obj))
+        for function in _functions(obj):
+            for name in _code_names(function.__code__):
+                member = None if owner is None else _member(owner, name)
+                if member is not None:
+                    todo.append(member)
+                if name not in module_globals:
+                    continue
+                value = module_globals[name]
+                if inspect.isclass(value) or callable(value):
+                    if is_local(value):
+                        todo.append(value)
+                elif name.isupper() and not isinstance(value, types.ModuleType):
+                    constants.add((obj.__module__, name))
+    return tuple(sorted(sources.items())), tuple(sorted(constants))
+
+
+def dependencies(obj):
+    # Everything the output of `obj` depends on besides its own arguments.
+    # Constants are read at call time so runtime overrides are picked up.
+    sources, constants = _walk(obj)
+    return {
+        "sources": dict(sources),
+        "constants": {
+            f"{module}.{name}": repr(getattr(sys.modules[module], name))
+            for module, name in constants
+        },
+    }
+
+
+def call_arguments(init, args, kwargs):
+    # All arguments of an `__init__(self, ...)` call by name, defaults included
+    bound = inspect.signature(init).bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(list(bound.arguments.items())[1:])
+    if "kwargs" in arguments:
+        arguments.update(arguments.pop("kwargs"))
+    return arguments
+
+
+def digest(*values):
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+@contextmanager
+def overrides(constants):
+    # Temporarily replace module-level constants, e.g. {"THICKNESS": 7}, in
+    # every loaded module of this repo that defines or imported them. Derived
+    # constants (KEY_SPACING from KEY_SIZE, ...) need overriding explicitly.
+    modules = [module for module in list(sys.modules.values()) if _in_repo(module)]
+    saved = []
+    try:
+        for name, value in constants.items():
+            targets = [module for module in modules if name in vars(module)]
+            if not targets:
+                raise KeyError(f"Unknown constant {name!r}")
+            for module in targets:
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
@@ -0,0 +1,440 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from deps import dependencies, digest
+from params import DRAFT, FINAL, is_draft
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("stl", "step", "3mf")
+DEFAULT_FORMATS = ("stl", "step")
+# An output isn't written again while the exact geometry it's made from (see
+# brep.geometry_digest) and the export settings match the record its
+# previous export left in RECORD_DIR of the output directory
+SKIP_UNCHANGED = os.environ.get("CORNE_SKIP_UNCHANGED", "1") != "0"
+RECORD_DIR = ".exports"
+
+# Mesh deflection per build quality as (linear, angular rad). The linear one
+# is relative to the size of each edge, like build123d's export_stl.
+TESSELLATION = {
+    FINAL: (1e-3, 0.1),
+    DRAFT: (0.05, 0.5),
+}
+# Adaptive meshing uses one absolute linear deflection, this fraction of the
+# part's diagonal, instead: long straight and gently curved edges get fewer
+# nodes while the angular deflection still refines fillets and holes
+ADAPTIVE_LINEAR = 2e-4
+# Per-part overrides by label, e.g. {"Cover": (0.01, 0.08)}
+PART_TESSELLATION = {
+    FINAL: {},
+    DRAFT: {},
+}
+
+
+def tessellation(shape, adaptive=False, overrides=None):
+    # (linear, angular, relative) deflection to mesh `shape` with
+    quality = DRAFT if is_draft() else FINAL
+    parts = {**PART_TESSELLATION[quality], **(overrides or {})}
+    if shape.label in parts:
+        return (*parts[shape.label], True)
+    linear, angular = TESSELLATION[quality]
+    if adaptive:
+        return shape.bounding_box().diagonal * ADAPTIVE_LINEAR, angular, False
+    return linear, angular, True
+
+
+def mesh(shape, linear, angular, relative=True, parallel=True):
+    # Triangulate in place, OCCT meshes the faces concurrently when parallel
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    from OCP.BRepTools import BRepTools
+
+    BRepTools.Clean_s(shape.wrapped)
+    BRepMesh_IncrementalMesh(shape.wrapped, linear, relative, angular, parallel)
+
+
+def face_triangles(shape, local=False):
+    # (nodes, triangles) numpy arrays per meshed face, in global coordinates
+    # (or the shape's own, without its location) and with the winding
+    # following the face orientation
+    from OCP.BRep import BRep_Tool
+    from OCP.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+    from OCP.TopExp import TopExp
+    from OCP.TopLoc import TopLoc_Location
+    from OCP.TopoDS import TopoDS
+    from OCP.TopTools import TopTools_IndexedMapOfShape
+
+    wrapped = shape.wrapped.Located(TopLoc_Location()) if local else shape.wrapped
+    faces = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(wrapped, TopAbs_FACE, faces)
+    for i in range(1, faces.Extent() + 1):
+        face = TopoDS.Face_s(faces.FindKey(i))
+        loc = TopLoc_Location()
+        tri = BRep_Tool.Triangulation_s(face, loc)
+        if tri is None:
+            continue
+        trsf = loc.Transformation()
+        nodes = np.array([
+            tri.Node(i).Transformed(trsf).Coord() for i in range(1, tri.NbNodes() + 1)
+        ])
+        triangles = np.array([
+            tri.Triangle(i).Get() for i in range(1, tri.NbTriangles() + 1)
+        ]) - 1
+        if face.Orientation() == TopAbs_REVERSED:
+            triangles = triangles[:, ::-1]
+        yield nodes, triangles
+
+
+def write_stl(shape, path):
+    # Binary STL, streamed face by face; the triangle count is patched in last
+    count = 0
+    with open(path, "wb") as f:
+        f.write(b"\0" * 80 + struct.pack("<I", 0))
+        for nodes, triangles in face_triangles(shape):
+            corners = nodes[triangles]
+            normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+            records = np.zeros(
+                len(triangles),
+                dtype=[("normal", "<f4", 3), ("corners", "<f4", (3, 3)), ("attr", "<u2")],
+            )
+            records["normal"] = normals
+            records["corners"] = corners
+            f.write(records.tobytes())
+            count += len(triangles)
+        f.seek(80)
+        f.write(struct.pack("<I", count))
+
+
+def write_step(shape, path):
+    # Through XCAF, so the labels, colors and the children of a Compound
+    # are kept as an assembly tree
+    from build123d import export_step
+
+    if not export_step(shape, path):
+        raise RuntimeError(f'Failed to write "{path}"')
+
+
+def _merged_mesh(shape, local=False):
+    # 3MF needs a closed mesh, so merge the nodes the faces share on edges
+    nodes, triangles, offset = [], [], 0
+    for face_nodes, face_tris in face_triangles(shape, local):
+        nodes.append(face_nodes)
+        triangles.append(face_tris + offset)
+        offset += len(face_nodes)
+    if not nodes:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=int)
+    nodes = np.concatenate(nodes)
+    _, first, inverse = np.unique(
+        np.round(nodes, 6), axis=0, return_index=True, return_inverse=True
+    )
+    triangles = inverse.reshape(-1)[np.concatenate(triangles)]
+    # Drop triangles that collapsed while merging
+    keep = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    return nodes[first], triangles[keep]
+
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+MODEL_NS = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+
+
+def _xml_attr(text):
+    return (
+        str(text).replace("&", "&amp;").replace('"', "&quot;")
+        .replace("<", "&lt;").replace(">", "&gt;")
+    )
+
+
+def _zip_member(name):
+    # Fixed timestamp so unchanged models produce identical archives
+    return zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+
+
+def _3mf_transform(trsf):
+    # 3MF transforms row vectors: the rotation transposed, then the translation
+    values = [trsf.Value(r, c) for c in range(1, 4) for r in range(1, 4)]
+    values += [trsf.Value(r, 4) for r in range(1, 4)]
+    return " ".join(f"{v:.9g}" for v in values)
+
+
+def _3mf_color(color):
+    return "#" + "".join(f"{round(c * 255):02X}" for c in tuple(color))
+
+
+def write_3mf(shapes, path, location=None):
+    # One mesh object per distinct shape, written to the zip member as it's
+    # generated, and one build item placing each shape. Shapes sharing their
+    # topology (a part used several times) are instances of one object.
+    # `location` places all of them, e.g. the location of their assembly.
+    objects, items = [], []
+    for shape in shapes:
+        index = next(
+            (i for i, o in enumerate(objects) if o.wrapped.IsPartner(shape.wrapped)), None
+        )
+        if index is None:
+            objects.append(shape)
+            index = len(objects) - 1
+        loc = shape.wrapped.Location()
+        if location is not None:
+            loc = location.wrapped.Multiplied(loc)
+        items.append((index + 1, loc))
+    colors = sorted({_3mf_color(o.color) for o in objects if o.color is not None})
+    materials = len(objects) + 1
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(_zip_member("[Content_Types].xml"), CONTENT_TYPES)
+        archive.writestr(_zip_member("_rels/.rels"), RELS)
+        with archive.open(_zip_member("3D/3dmodel.model"), "w") as model:
+            model.write(
+                f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<model unit="millimeter" xml:lang="en-US" xmlns="{MODEL_NS}">\n'
+                f"<resources>\n".encode()
+            )
+            if colors:
+                model.write(f'<basematerials id="{materials}">\n'.encode())
+                model.write("".join(
+                    f'<base name="{color}" displaycolor="{color}"/>\n' for color in colors
+                ).encode())
+                model.write(b"</basematerials>\n")
+            for i, shape in enumerate(objects, 1):
+                nodes, triangles = _merged_mesh(shape, local=True)
+                material = ""
+                if shape.color is not None:
+                    material = f' pid="{materials}" pindex="{colors.index(_3mf_color(shape.color))}"'
+                model.write(
+                    f'<object id="{i}" type="model" name="{_xml_attr(shape.label)}"{material}>'
+                    f"<mesh><vertices>\n".encode()
+                )
+                model.write("".join(
+                    f'<vertex x="{x:.6g}" y="{y:.6g}" z="{z:.6g}"/>\n' for x, y, z in nodes
+                ).encode())
+                model.write(b"</vertices><triangles>\n")
+                model.write("".join(
+                    f'<triangle v1="{a}" v2="{b}" v3="{c}"/>\n' for a, b, c in triangles
+                ).encode())
+                model.write(b"</triangles></mesh></object>\n")
+            model.write(b"</resources>\n<build>\n")
+            for i, loc in items:
+                transform = ""
+                if not loc.IsIdentity():
+                    transform = f' transform="{_3mf_transform(loc.Transformation())}"'
+                model.write(f'<item objectid="{i}"{transform}/>\n'.encode())
+            model.write(b"</build>\n</model>\n")
+
+
+def _content_hash(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".step"):
+        # The header holds a timestamp, only compare the model data
+        data = data.partition(b"\nDATA;")[2]
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_atomic(path, write):
+    # Write through `write(tmp)` next to `path` and only replace it if the
+    # content changed, so readers never see a partial file and unchanged
+    # outputs keep their timestamps
+    start = time.perf_counter()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    os.chmod(tmp, 0o644)
+    try:
+        write(tmp)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    if os.path.exists(path) and _content_hash(path) == _content_hash(tmp):
+        os.remove(tmp)
+        log.info(f'Unchanged "{path}"')
+    else:
+        os.replace(tmp, path)
+        log.info(f'Exported "{path}" in {time.perf_counter() - start:.2f}s')
+    return path
+
+
+def set_skip_unchanged(enabled):
+    # Through the environment too, so freshly spawned workers agree
+    global SKIP_UNCHANGED
+    SKIP_UNCHANGED = enabled
+    os.environ["CORNE_SKIP_UNCHANGED"] = "1" if enabled else "0"
+
+
+def _record_path(out_dir, fmt, name):
+    # out/stl/Cover.stl is recorded in out/.exports/stl/Cover.json
+    return os.path.join(out_dir, RECORD_DIR, fmt, f"{name}.json")
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_record(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_record(path, record):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _output_key(shapes, fmt, mesh_options, location=None):
+    # Everything the output of `shapes` (placed at `location`) in `fmt` is
+    # made from: their geometry, labels and colors, the mesh deflection and
+    # the writer's code
+    from brep import geometry_digest
+
+    meshed = fmt in ("stl", "3mf")
+    writer = {"stl": write_stl, "3mf": write_3mf, "step": write_step}[fmt]
+    return digest(
+        fmt,
+        [
+            (
+                shape.label,
+                None if shape.color is None else tuple(shape.color),
+                geometry_digest(shape),
+                tessellation(
+                    shape, mesh_options.get("adaptive", False), mesh_options.get("parts")
+                ) if meshed else None,
+            )
+            for shape in shapes
+        ],
+        dependencies(_mesh_once) if meshed else None,
+        dependencies(writer),
+        None if location is None else tuple(location.position) + tuple(location.orientation),
+    )
+
+
+def _unchanged(record_path, path, key):
+    # The output is still the file the recorded export wrote with this key
+    record = _load_record(record_path)
+    return (
+        SKIP_UNCHANGED
+        and record is not None
+        and record["key"] == key
+        and os.path.exists(path)
+        and record["stat"] == _stat(path)
+    )
+
+
+def _triangulated(shape):
+    # Every face has a mesh, e.g. from an earlier export
+    from OCP.BRep import BRep_Tool
+    from OCP.TopLoc import TopLoc_Location
+
+    return all(
+        BRep_Tool.Triangulation_s(face.wrapped, TopLoc_Location()) is not None
+        for face in shape.faces()
+    )
+
+
+def _mesh_once(shape, mesh_options):
+    deflection = tessellation(
+        shape, mesh_options.get("adaptive", False), mesh_options.get("parts")
+    )
+    mesh(shape, *deflection, mesh_options.get("parallel", True))
+
+
+def export_part(part, formats=DEFAULT_FORMATS, out_dir=".", mesh_options=None):
+    # mesh_options: {"adaptive": bool, "parallel": bool, "parts": {label: (lin, ang)}}
+    mesh_options = mesh_options or {}
+    meshed = False
+    paths = []
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        os.makedirs(os.path.join(out_dir, fmt), exist_ok=True)
+        # Labels like "MC/display cover" aren't valid file names
+        name = part.label.replace("/", "-")
+        path = os.path.join(out_dir, fmt, f"{name}.{fmt}")
+        record = _record_path(out_dir, fmt, name)
+        key = _output_key([part], fmt, mesh_options)
+        if _unchanged(record, path, key):
+            log.info(f'Unchanged "{path}", skipped')
+            paths.append(path)
+            continue
+
+        if fmt in ("stl", "3mf") and not meshed:
+            _mesh_once(part, mesh_options)
+            meshed = True
+
+        if fmt == "stl":
+            write = functools.partial(write_stl, part)
+        elif fmt == "3mf":
+            write = functools.partial(write_3mf, [part])
+        else:
+            write = functools.partial(write_step, part)
+        paths.append(write_atomic(path, write))
+        _save_record(record, {"key": key, "stat": _stat(path)})
+    return paths
+
+
+def export_assembly(
+    assembly, formats=DEFAULT_FORMATS, out_dir=".", mesh_options=None, parts=True,
+):
+    # The parts of `assembly` one by one (unless `parts` is false), then the
+    # whole assembly as a single STEP and/or 3MF file with the parts' labels,
+    # colors and placements. Parts used several times are stored once and
+    # placed as instances in both.
+    mesh_options = mesh_options or {}
+    paths = []
+    if parts:
+        for part in assembly.children:
+            paths += export_part(part, formats, out_dir, mesh_options)
+
+    name = (assembly.label or "assembly").replace("/", "-")
+    for fmt in [f for f in ("step", "3mf") if f in formats]:
+        os.makedirs(os.path.join(out_dir, fmt), exist_ok=True)
+        path = os.path.join(out_dir, fmt, f"{name}.{fmt}")
+        record = _record_path(out_dir, fmt, name)
+        key = _output_key(assembly.children, fmt, mesh_options, assembly.location)
+        if _unchanged(record, path, key):
+            log.info(f'Unchanged "{path}", skipped')
+            paths.append(path)
+            continue
+
+        if fmt == "step":
+            write = functools.partial(write_step, assembly)
+        else:
+            # export_part() may have skipped the parts or written no meshes
+            meshed = []
+            for part in assembly.children:
+                if not any(m.wrapped.IsPartner(part.wrapped) for m in meshed):
+                    if not _triangulated(part):
+                        _mesh_once(part, mesh_options)
+                    meshed.append(part)
+            write = functools.partial(write_3mf, assembly.children, location=assembly.location)
+        paths.append(write_atomic(path, write))
+        _save_record(record, {"key": key, "stat": _stat(path)})
+    return paths
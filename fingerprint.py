@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import math
+import time
+from collections import Counter
+
+from build import COLS, PARTS, build_part, setup_logging
+from deps import digest
+
+log = logging.getLogger(__name__)
+
+# A part's geometry in a few numbers: volume, area, bounding box, faces and
+# edges by type and the joints, rounded so that kernel noise (BREP round
+# trips, copies, boolean order) doesn't change them. Takes milliseconds and
+# no mesh, so unlike diffing exported STLs it's deterministic and quick to
+# compare across refactors. Being lossy (an edit can keep the volume and
+# box), exports key on brep.geometry_digest instead.
+#
+# Lengths are rounded to DIGITS decimals (mm), unitless values (directions,
+# rotations) to ANGULAR_DIGITS and volume and area to SIGNIFICANT digits
+DIGITS = 3
+ANGULAR_DIGITS = 6
+SIGNIFICANT = 6
+# compare() tolerances, a bit over the rounding so values that round to
+# neighbouring steps still match
+TOLERANCE = 2 * 10**-DIGITS
+RELATIVE_TOLERANCE = 2 * 10**-SIGNIFICANT
+
+
+def _round(value, digits):
+    # Without -0.0, it would print differently from 0.0
+    return round(value, digits) + 0.0
+
+
+def _significant(value, digits=SIGNIFICANT):
+    return float(f"{value:.{digits}g}") + 0.0
+
+
+def _counts(shapes):
+    counts = Counter(getattr(s.geom_type, "name", s.geom_type) for s in shapes)
+    return dict(sorted(counts.items()))
+
+
+def _transform(values):
+    # 3x4 row-major matrix, rotation columns unitless, translation in mm
+    return [
+        _round(v, DIGITS if i % 4 == 3 else ANGULAR_DIGITS) for i, v in enumerate(values)
+    ]
+
+
+def _joint(joint):
+    if joint["type"] == "rigid":
+        return {"type": "rigid", "location": _transform(joint["location"])}
+    return {
+        "type": joint["type"],
+        "position": [_round(v, DIGITS) for v in joint["position"]],
+        "direction": [_round(v, ANGULAR_DIGITS) for v in joint["direction"]],
+        "linear_range": [_round(v, DIGITS) for v in joint["linear_range"]],
+    }
+
+
+def fingerprint(shape):
+    # JSON-able summary of `shape` in global coordinates, joints included
+    from OCP.Bnd import Bnd_Box
+    from OCP.BRepBndLib import BRepBndLib
+
+    import brep
+
+    # The tight box of the geometry itself: unlike bounding_box() it ignores
+    # an existing mesh and tolerances, and doesn't sample B-spline faces
+    box = Bnd_Box()
+    BRepBndLib.AddClose_s(shape.wrapped, box)
+    trsf = shape.location.wrapped.Transformation()
+    return {
+        "volume": _significant(shape.volume),
+        "area": _significant(shape.area),
+        "bounds": [_round(v, DIGITS) for v in box.Get()],
+        "location": _transform([trsf.Value(r, c) for r in range(1, 4) for c in range(1, 5)]),
+        "solids": len(shape.solids()),
+        "faces": _counts(shape.faces()),
+        "edges": _counts(shape.edges()),
+        "joints": {
+            joint["label"]: _joint(joint)
+            for joint in sorted(brep.state(shape)["joints"], key=lambda j: j["label"])
+        },
+    }
+
+
+def fingerprint_digest(fingerprint):
+    return digest(json.dumps(fingerprint, sort_keys=True))
+
+
+def _close(a, b):
+    return math.isclose(a, b, rel_tol=RELATIVE_TOLERANCE, abs_tol=TOLERANCE)
+
+
+def compare(expected, actual, path=""):
+    # Differences between two fingerprints (or dicts of them by part) as
+    # "path: expected -> actual" lines, numbers within the tolerances match
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return [
+            line
+            for key in sorted(set(expected) | set(actual))
+            for line in compare(expected.get(key), actual.get(key), f"{path}.{key}".lstrip("."))
+        ]
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        if all(_close(a, b) for a, b in zip(expected, actual)):
+            return []
+    elif (
+        isinstance(expected, (int, float)) and isinstance(actual, (int, float))
+        and _close(expected, actual)
+    ):
+        return []
+    elif expected == actual:
+        return []
+    return [f"{path}: {expected} -> {actual}"]
+
+
+def fingerprints(names=tuple(PARTS), params=None):
+    # Fingerprint of each part by name, built (or loaded from the cache) here
+    params = {"cols": COLS} if params is None else params
+    results = {}
+    for name in names:
+        part = build_part(name, params)
+        start = time.perf_counter()
+        results[name] = fingerprint(part)
+        log.info(f'Fingerprinted "{part.label}" in {(time.perf_counter() - start) * 1e3:.1f}ms')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fingerprint the parts' geometry and compare it with an earlier run"
+    )
+    parser.add_argument("--cols", type=int, default=COLS, choices=(5, 6))
+    parser.add_argument("--parts", nargs="+", default=list(PARTS), choices=list(PARTS))
+    parser.add_argument("-o", "--output", metavar="JSON", help="write the fingerprints here")
+    parser.add_argument(
+        "--check", metavar="JSON",
+        help="compare with fingerprints written by -o, exit with an error if any differ",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    results = fingerprints(args.parts, {"cols": args.cols})
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if not args.check:
+        for name, result in results.items():
+            print(f"{name:<10}{fingerprint_digest(result)[:16]}")
+        return
+    with open(args.check) as f:
+        expected = json.load(f)
+    differences = compare({n: expected.get(n) for n in results}, results)
+    for line in differences:
+        print(line)
+    if differences:
+        raise SystemExit(1)
+    print(f"{len(results)} parts unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from build123d import Plane
+from build123d.topology import downcast
+from OCP.BRepBuilderAPI import BRepBuilderAPI_Transform
+from OCP.gp import gp_Ax2, gp_Dir, gp_Pnt, gp_Trsf
+
+import brep
+from params import BUILT_HAND, HANDS
+
+# The other half is the built one mirrored about this plane
+MIRROR_PLANE = Plane.YZ
+
+
+def mirror_trsf(plane=MIRROR_PLANE):
+    trsf = gp_Trsf()
+    trsf.SetMirror(gp_Ax2(gp_Pnt(*plane.origin), gp_Dir(*plane.z_dir)))
+    return trsf
+
+
+def _mirror_joint(joint, trsf):
+    # Joints are stored in global coordinates. Conjugating a rigid joint's
+    # frame keeps it right-handed, and joints connected on the mirrored parts
+    # then place them as the mirror image of the original assembly.
+    joint = dict(joint)
+    if joint["type"] == "rigid":
+        frame = gp_Trsf()
+        frame.SetValues(*joint["location"])
+        frame = trsf.Multiplied(frame).Multiplied(trsf)
+        joint["location"] = [frame.Value(r, c) for r in range(1, 4) for c in range(1, 5)]
+    else:
+        joint["position"] = gp_Pnt(*joint["position"]).Transformed(trsf).Coord()
+        joint["direction"] = gp_Dir(*joint["direction"]).Transformed(trsf).Coord()
+    return joint
+
+
+def handed(part, hand):
+    # `part` as used in the `hand` half, relabelled and mirrored from the
+    # built BREP when needed instead of rebuilt from its sketches
+    if hand not in HANDS:
+        raise ValueError(f"Unknown hand {hand!r}")
+    state = brep.state(part)
+    state["label"] = f"{part.label} ({hand})"
+    if hand != BUILT_HAND:
+        trsf = mirror_trsf()
+        state["wrapped"] = downcast(BRepBuilderAPI_Transform(part.wrapped, trsf, True).Shape())
+        state["joints"] = [_mirror_joint(joint, trsf) for joint in state["joints"]]
+    return brep.from_state(state)
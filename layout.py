@@ -0,0 +1,135 @@
+import functools
+import math
+
+import numpy as np
+
+# Defaults
+KEY_SIZE = 14
+# Holes in the flat plates, see corne_board.KeyPlateSketch and plates.py
+PLATE_KEY_HOLE = KEY_SIZE - 0.2
+SCREW_RADIUS = 1.2
+KEY_MARGIN = (2, 1.5)
+STAGGER_OFFSETS = [2, 4.45, 6.8, 4.45, -0.2, -0.2]
+KEY_SPACING = (KEY_SIZE + (KEY_MARGIN[0] * 2), KEY_SIZE + (KEY_MARGIN[1] * 2))
+ROWS = 3
+GRID_START_X = 27.5
+# (x, y, rotation in degrees)
+THUMB_KEYS = [(14.8, -10.8, 30), (35, -7.2, 15), (54.8, -4.5, 0)]
+# Screw positions of the 6 column board, the outer ones move in with the
+# last column for fewer columns
+SCREW_POSITIONS = [(23.05, -4.55), (67.6, 2.1), (108.50, 16.8), (108.50, 33.75), (36.50, 37.2)]
+OUTER_SCREWS = [2, 3]
+MC_COVER_SCREW_POSITIONS = [(1.8, .4), (15.5, 7.6)]
+# Top left corner of the MC/display cutout, then each side clockwise
+MC_CUTOUT_START = (-0.85, 53)
+MC_CUTOUT_SIDES = [(19.3, 0), (0, -48.31), (-3.25, 0), (-16.05, -16.05 * math.tan(math.radians(30)))]
+
+# Positions are computed once per distinct set of inputs, constants included
+# so overridden ones (see deps.overrides) get their own entry. The arrays are
+# shared, so they're read-only.
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+def _tuples(rows):
+    return tuple(tuple(row) for row in rows)
+
+
+@functools.lru_cache(maxsize=None)
+def _key_positions(cols, rows, thumb_keys, start_x, key_size, margin, spacing, stagger):
+    if cols > len(stagger):
+        raise ValueError(f"STAGGER_OFFSETS only has {len(stagger)} columns, not {cols}")
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    grid = np.column_stack([
+        start_x + (spacing[0] * col),
+        margin[1] + key_size / 2 + (spacing[1] * row) + np.array(stagger)[col],
+        np.zeros(rows * cols),
+    ])
+    thumbs = np.array(thumb_keys, dtype=float).reshape(-1, 3)
+    return _frozen(np.concatenate([thumbs, grid]))
+
+
+def key_positions(cols=6, rows=ROWS, thumb_keys=None):
+    # (x, y, rotation) per key: the thumb keys, then the grid row by row
+    return _key_positions(
+        cols, rows, _tuples(THUMB_KEYS if thumb_keys is None else thumb_keys),
+        GRID_START_X, KEY_SIZE, tuple(KEY_MARGIN), tuple(KEY_SPACING),
+        tuple(STAGGER_OFFSETS),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _screw_positions(cols, positions, outer, spacing_x):
+    positions = np.array(positions, dtype=float)
+    positions[list(outer), 0] -= spacing_x * (6 - cols)
+    return _frozen(positions)
+
+
+def screw_positions(cols=6):
+    return _screw_positions(
+        cols, _tuples(SCREW_POSITIONS), tuple(OUTER_SCREWS), KEY_SPACING[0]
+    )
+
+
+def mc_cover_screw_positions():
+    return _frozen(np.array(MC_COVER_SCREW_POSITIONS, dtype=float))
+
+
+@functools.lru_cache(maxsize=None)
+def _base_plate_outline(cols, rows, key_size, margin, stagger):
+    seg_width = (margin[0] * 2) + key_size
+    widths = np.full(cols - 1, seg_width)
+    widths[0:1] += 1
+    widths[2:3] -= 1
+    # Step along the top edge, one column (and its stagger) at a time
+    steps = np.zeros((2 * (cols - 1), 2))
+    steps[0::2, 0] = widths
+    steps[1::2, 1] = np.diff(stagger[:cols])
+    steps = steps[np.any(steps != 0, axis=1)]
+    steps = np.concatenate([[[18.5, 0]], steps, [[widths[-1] + 1.8, 0]]])
+
+    start = np.array([-0.8, -1])
+    top_left = [-0.8, (rows * ((margin[1] * 2) + key_size)) + stagger[0]]
+    top = top_left + np.cumsum(steps, axis=0)
+    top_right = top[-1]
+    # Down the outer side, then back along the thumb cluster
+    dx = (widths[-1] * (cols - 3)) + 1.5
+    bottom = [top_right[0], -0.5] + np.cumsum(
+        [[0, 0], [-dx, 0], [-9, -12.2], [-33.1, -4.55], [-16.35, -9.12]], axis=0
+    )
+    points = np.concatenate([[start, top_left], top, bottom])
+    # Collinear segments are a single edge, drop the corners between them
+    before = points - np.roll(points, 1, axis=0)
+    after = np.roll(points, -1, axis=0) - points
+    turns = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    return _frozen(points[~np.isclose(turns, 0)])
+
+
+def base_plate_outline(cols=6):
+    # Corners of the base plate outline, clockwise from the bottom left
+    return _base_plate_outline(
+        cols, ROWS, KEY_SIZE, tuple(KEY_MARGIN), tuple(STAGGER_OFFSETS)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _mc_cutout_outline(start, sides):
+    return _frozen(start + np.cumsum([[0, 0], *sides], axis=0))
+
+
+def mc_cutout_outline():
+    # Corners of the MC/display cutout, the last side closes it
+    return _mc_cutout_outline(MC_CUTOUT_START, _tuples(MC_CUTOUT_SIDES))
+
+
+def to_locations(positions):
+    # One Location per (x, y) or (x, y, rotation) row
+    from build123d import Location, Vector
+
+    if positions.shape[1] == 2:
+        return [Location(Vector(x, y)) for x, y in positions.tolist()]
+    norm = Vector(0, 0, 1)
+    return [Location(Vector(x, y), norm, r) for x, y, r in positions.tolist()]
@@ -1,58 +1,34 @@
+import argparse
 import logging
-import os
 
-from build123d import *
-from ocp_vscode import show, Camera
-
-from cover import Cover
-from switch import PowerSwitch
-from button import Button
-from bottom import BottomPlate
-from mc_cover import MCCover
+from build import COLS, assemble, build_part, setup_logging
+from export import export_assembly
 
+# For headless/parallel builds use `python build.py` instead
 
 # --| Boilerplate for development |------------------------
-from OCP import Message  # Make things less verbose
-for printer in Message.Message.DefaultMessenger_s().Printers():
-    printer.SetTraceLevel(Message.Message_Gravity(3))
+parser = argparse.ArgumentParser(description="Build the case and show it in the viewer")
+parser.add_argument(
+    "--no-show", action="store_true",
+    help="only export, without importing or connecting to ocp_vscode",
+)
+args = parser.parse_args()
+setup_logging()
 log = logging.getLogger(__name__)
-logging.getLogger("build123d").setLevel(logging.WARNING)
-logging.captureWarnings(True)
 # ---------------------------------------------------------
 
-COLS=6
-
-cover = Cover(cols=COLS)
-switch = PowerSwitch()
-button = Button()
-bottom = BottomPlate(cols=COLS)
-mc_cover = MCCover()
-
-cover.joints["switch_slide"].connect_to(switch.joints["joint"])
-cover.joints["button"].connect_to(button.joints["joint"])
-cover.joints["bottom"].connect_to(bottom.joints["joint"])
-cover.joints["mc_cover"].connect_to(mc_cover.joints["joint"])
-
-assembly = Compound(
-    label="Corne Wireless Case",
-    children=[cover, switch, button, bottom, mc_cover]
-)
-
-for part in assembly.children:
-    part.color = Color(0, 0, 0)
-
-assembly = Rotation(about_y=180) * Pos(10, 0, 0) * assembly
+params = {"cols": COLS}
+parts = {
+    name: build_part(name, params)
+    for name in ("cover", "switch", "button", "bottom", "mc_cover")
+}
+assembly = assemble(parts)
 
-show(assembly, progress=None, reset_camera=Camera.KEEP)
+if not args.no_show:
+    # The viewer is only needed (and only has to be running) for this
+    from ocp_vscode import show, Camera
 
-# Export step & stl files
-for part in assembly.children:
-    if not os.path.exists("step"):
-        os.mkdir("step")
-    if not os.path.exists("stl"):
-        os.mkdir("stl")
+    show(assembly, progress=None, reset_camera=Camera.KEEP)
 
-    part.export_stl(os.path.join("stl", f"{part.label}.stl"))
-    log.info(f'Exported "{part.label}.stl"')
-    part.export_step(os.path.join("step", f"{part.label}.step"))
-    log.info(f'Exported "{part.label}.step"')
+# Export step & stl files of the parts, and the assembly as one step file
+export_assembly(assembly)
@@ -1,8 +1,10 @@
 import math
 from build123d import *
 
+from cache import cached, memoized
 from corne_board import MCCoverScrewLocations, MCCutoutSketch
-from params import FR, HULL_THICKNESS, MC_COVER_HEIGHT
+from params import FR, HULL_THICKNESS, MC_COVER_HEIGHT, is_draft
+from profiler import mark, profiled
 
 C, MIN, MAX = Align.CENTER, Align.MIN, Align.MAX
 TOP_THICKNESS = 1.8
@@ -10,6 +12,8 @@ DISPLAY_OFFSET_X = 3
 DISPLAY_OFFSET_Y = 10
 
 
+@memoized
+@cached
 class MCCoverSketch(Sketch):
     def __init__(self):
         # Add MC cover portion, flat on top
@@ -29,12 +33,15 @@ class MCCoverSketch(Sketch):
         sk += make_face(ln)
 
         # round corners
-        sk = fillet(sk.vertices().group_by(Axis.Y)[-1].sort_by(Axis.X).first, FR)
-        sk = fillet(sk.vertices().group_by(Axis.Y)[0].sort_by(Axis.X).first, FR)
+        if not is_draft():
+            sk = fillet(sk.vertices().group_by(Axis.Y)[-1].sort_by(Axis.X).first, FR)
+            sk = fillet(sk.vertices().group_by(Axis.Y)[0].sort_by(Axis.X).first, FR)
 
         super().__init__(sk.wrapped)
 
 
+@memoized
+@cached
 class MCCoverCutoutSketch(Sketch):
     def __init__(self):
         sk = MCCutoutSketch()
@@ -48,27 +55,26 @@ class MCCoverCutoutSketch(Sketch):
         super().__init__(sk.wrapped)
 
 
+@memoized
+@profiled
+@cached
 class MCCover(Part):
     def __init__(self, **kwargs):
         kwargs["label"] = kwargs.get("label", "MC/display cover")
         sk = MCCoverSketch()
         part = extrude(sk, MC_COVER_HEIGHT)
-        top_edges = part.edges().group_by(Axis.Z)[-1]
-        top_right = top_edges.vertices().group_by(Axis.X)[-1].sort_by(Axis.Y).last.center()
-        exclude = ShapeList([top_edges.filter_by(Axis.Y).sort_by(Axis.X).last])
-        part = fillet(top_edges - exclude, FR)
+        mark("extrude", part)
+        # The edge selections live in the methods, so the shapes they were
+        # picked from are freed as soon as they're used
+        top_right = self.top_edges(part).vertices().group_by(Axis.X)[-1].sort_by(Axis.Y).last.center()
+        if not is_draft():
+            part = self.fillet_top(part)
         part -= extrude(MCCoverCutoutSketch(), MC_COVER_HEIGHT - TOP_THICKNESS)
-        # show(part, reset_camera=Camera.KEEP)
-        # raise Exception
+        mark("fillet and hollow", part)
 
-        # chamfer right edge
-        right_edges = part.edges().group_by(Axis.X)[-1]
-        chamf_edges = ShapeList()
-        chamf_edges += ShapeList([right_edges.sort_by(Axis.Z).last])
-        chamf_edges += ShapeList([right_edges.filter_by(Axis.Z).sort_by(Axis.Y).first])
-        chamf_edges += ShapeList([right_edges.filter_by(Axis.Z).sort_by(Axis.Y).last])
-        chamf_edges += right_edges.filter_by(GeomType.CIRCLE)
-        part = chamfer(chamf_edges, 0.5)
+        if not is_draft():
+            part = self.chamfer_right_edge(part)
+        mark("chamfer right edge", part)
 
         # cut display hole
         top_face = part.faces().sort_by(Axis.Z).last
@@ -79,6 +85,7 @@ class MCCover(Part):
         display_inset = display_plane * Pos(-1.25, -5) * Rectangle(14.5, 37.25, align=(MIN, MIN))
         part -= extrude(display_hole, -TOP_THICKNESS)
         part -= extrude(Pos(0, 0, -0.4) * display_inset, -1.8)
+        mark("display hole", part)
 
         # cut USB-C port hole
         back_face = part.faces().sort_by(Axis.Y).last
@@ -86,19 +93,45 @@ class MCCover(Part):
         sk = plane * Rectangle(10.2, 4.4)
         sk = fillet(sk.vertices(), 2.2)
         part -= extrude(sk, -4)
+        mark("USB-C port hole", part)
 
-        # chamfer hole edges
-        top = part.edges().group_by(Axis.Z)[-1]
-        chamf_edges = ShapeList(top.filter_by(Axis.Y).sort_by(Axis.X)[1:3])
-        chamf_edges += ShapeList(top.filter_by(Axis.X).sort_by(Axis.Y)[1:3])
-        part = chamfer(chamf_edges, 0.39)
+        if not is_draft():
+            part = self.chamfer_hole_edges(part)
+        mark("chamfer hole edges", part)
 
         # Cut screw holes
         part -= Plane.XY * MCCoverScrewLocations() * extrude(Circle(1.2), 4.9)
-        joint_location = MCCoverScrewLocations().locations[0]
-        joint = RigidJoint("joint", part, joint_location=joint_location)
+        mark("screw holes", part)
 
         # Mirror
         part = mirror(part, about=Plane.XY)
+        mark("mirror", part)
+
+        super().__init__(part.wrapped, **kwargs)
+        # On the finished part, a joint on an intermediate one would keep
+        # that alive (and be copied along by the mirror)
+        RigidJoint("joint", self, joint_location=MCCoverScrewLocations().locations[0])
+
+    @staticmethod
+    def top_edges(part):
+        return part.edges().group_by(Axis.Z)[-1]
 
-        super().__init__(part.wrapped, joints={"joint": joint}, **kwargs)
+    def fillet_top(self, part):
+        top_edges = self.top_edges(part)
+        exclude = ShapeList([top_edges.filter_by(Axis.Y).sort_by(Axis.X).last])
+        return fillet(top_edges - exclude, FR)
+
+    def chamfer_right_edge(self, part):
+        right_edges = part.edges().group_by(Axis.X)[-1]
+        chamf_edges = ShapeList()
+        chamf_edges += ShapeList([right_edges.sort_by(Axis.Z).last])
+        chamf_edges += ShapeList([right_edges.filter_by(Axis.Z).sort_by(Axis.Y).first])
+        chamf_edges += ShapeList([right_edges.filter_by(Axis.Z).sort_by(Axis.Y).last])
+        chamf_edges += right_edges.filter_by(GeomType.CIRCLE)
+        return chamfer(chamf_edges, 0.5)
+
+    def chamfer_hole_edges(self, part):
+        top = part.edges().group_by(Axis.Z)[-1]
+        chamf_edges = ShapeList(top.filter_by(Axis.Y).sort_by(Axis.X)[1:3])
+        chamf_edges += ShapeList(top.filter_by(Axis.X).sort_by(Axis.Y)[1:3])
+        return chamfer(chamf_edges, 0.39)
@@ -0,0 +1,63 @@
+import ctypes
+import ctypes.util
+import gc
+import resource
+import sys
+
+# Process memory as seen by the OS. The CAD kernel allocates outside of
+# Python's heap, so tracemalloc doesn't see most of it. On Linux the peak can
+# be reset (clear_refs), elsewhere peak_rss() is the process' lifetime peak.
+
+
+def _status(field):
+    # A "VmRSS:  1234 kB" line of /proc/self/status in bytes, None without it
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss():
+    return _status("VmRSS")
+
+
+def peak_rss():
+    # Bytes since the last reset_peak(), ru_maxrss is in kilobytes on Linux
+    # and bytes on macOS
+    peak = _status("VmHWM")
+    if peak is not None:
+        return peak
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(name)
+        return libc if hasattr(libc, "malloc_trim") else None
+    except OSError:
+        return None
+
+
+_LIBC = _libc() if sys.platform.startswith("linux") else None
+
+
+def release():
+    # Free what only reference cycles keep alive (joints and their parts),
+    # and hand the freed heap back to the OS so RSS shows what's retained
+    gc.collect()
+    if _LIBC is not None:
+        _LIBC.malloc_trim(0)
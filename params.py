@@ -1,4 +1,30 @@
+import os
+
 THICKNESS = 6.45
 FR = 3
 HULL_THICKNESS = 3
 MC_COVER_HEIGHT = 7.4
+
+# Build quality: "draft" skips fillets/chamfers and the key recesses and
+# meshes coarsely for fast layout iteration (a Cover builds in about 0.7s
+# instead of 2s), "final" produces the printable geometry
+DRAFT, FINAL = "draft", "final"
+QUALITY = os.environ.get("CORNE_QUALITY", FINAL)
+
+# Keyboard halves. The builders produce the left one: the case is modelled
+# upside down with the thumb keys towards -X.
+LEFT, RIGHT = "left", "right"
+HANDS = (LEFT, RIGHT)
+BUILT_HAND = LEFT
+
+
+def is_draft():
+    return QUALITY == DRAFT
+
+
+def set_quality(quality):
+    # Through the environment too, so freshly spawned workers agree
+    global QUALITY
+    if quality not in (DRAFT, FINAL):
+        raise ValueError(f"Unknown quality {quality!r}")
+    QUALITY = os.environ["CORNE_QUALITY"] = quality
@@ -0,0 +1,483 @@
+import argparse
+import functools
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+import layout
+from export import write_atomic
+from layout import PLATE_KEY_HOLE, SCREW_RADIUS
+from params import BUILT_HAND, HANDS, is_draft
+
+log = logging.getLogger(__name__)
+
+# Flat plates for laser/CNC cutting, straight from the layout's positions and
+# outlines: the same profiles as corne_board's KeyPlateSketch and
+# BasePlateSketch, without the CAD kernel.
+PLATE_FORMATS = ("dxf", "svg")
+PLATES = ("key", "base")
+FILLET_RADIUS = 1
+# Sheet size (mm) and the space left around and between nested plates
+SHEET = (600, 400)
+GAP = 3
+# The cutout is moved by this much so no edges overlap or meet at vertices,
+# slivers and vertices closer than TOLERANCE are cleaned up afterwards
+NUDGE = np.array([0.6, 0.8]) * 1e-7
+TOLERANCE = 1e-5
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def signed_area(points):
+    # Positive for counter-clockwise polygons
+    return _cross(points, np.roll(points, -1, axis=0)).sum() / 2
+
+
+def _ccw(points):
+    return points if signed_area(points) > 0 else points[::-1]
+
+
+def _inside(point, polygon):
+    p0, p1 = polygon, np.roll(polygon, -1, axis=0)
+    straddles = (p0[:, 1] > point[1]) != (p1[:, 1] > point[1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = p0[:, 0] + (point[1] - p0[:, 1]) * (p1[:, 0] - p0[:, 0]) / (p1[:, 1] - p0[:, 1])
+    return np.sum(straddles & (point[0] < x)) % 2 == 1
+
+
+def _clean(points, tolerance=TOLERANCE):
+    # Drop vertices on (or within `tolerance` of) the line through their
+    # neighbours: collinear ones, duplicates and the tips of slivers
+    points = [np.asarray(p) for p in points]
+    changed = True
+    while changed and len(points) > 2:
+        changed = False
+        for i in range(len(points)):
+            prev, point, next = points[i - 1], points[i], points[(i + 1) % len(points)]
+            chord = next - prev
+            length = np.hypot(*chord)
+            if length < tolerance:
+                distance = np.hypot(*(point - prev))
+            else:
+                distance = abs(_cross(chord, point - prev)) / length
+            if distance < tolerance:
+                del points[i]
+                changed = True
+                break
+    return np.array(points)
+
+
+def _crossings(a, b):
+    # Proper crossings between the edges of closed polygons a and b as
+    # (edge of a, parameter along it, edge of b, parameter along it, point)
+    d = np.roll(a, -1, axis=0) - a
+    e = np.roll(b, -1, axis=0) - b
+    w = b[None] - a[:, None]
+    denom = _cross(d[:, None], e[None])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = _cross(w, e[None]) / denom
+        u = _cross(w, d[:, None]) / denom
+    hits = (denom != 0) & (t > 0) & (t < 1) & (u > 0) & (u < 1)
+    return [(i, t[i, j], j, u[i, j], a[i] + d[i] * t[i, j]) for i, j in zip(*np.nonzero(hits))]
+
+
+def _with_crossings(polygon, crossings):
+    # The polygon's vertices with the crossings inserted along their edges,
+    # as (point, crossing index or None)
+    nodes = []
+    for i, point in enumerate(polygon):
+        nodes.append((point, None))
+        on_edge = sorted((t, k) for k, (edge, t) in enumerate(crossings) if edge == i)
+        nodes += [(None, k) for _, k in on_edge]
+    return nodes
+
+
+def difference(a, b):
+    # The polygon a minus the polygon b, as counter-clockwise outlines and
+    # clockwise holes (Greiner-Hormann). b is nudged off a's edges and
+    # vertices first, which makes every crossing a proper one.
+    a, b = _ccw(np.asarray(a, dtype=float)), _ccw(np.asarray(b, dtype=float) + NUDGE)
+    crossings = _crossings(a, b)
+    if not crossings:
+        if _inside(a[0], b):
+            return []
+        return [a, b[::-1]] if _inside(b[0], a) else [a]
+
+    points = [point for *_, point in crossings]
+    a_nodes = _with_crossings(a, [(i, t) for i, t, *_ in crossings])
+    b_nodes = _with_crossings(b, [(j, u) for _, _, j, u, _ in crossings])
+    a_at = {k: n for n, (_, k) in enumerate(a_nodes) if k is not None}
+    b_at = {k: n for n, (_, k) in enumerate(b_nodes) if k is not None}
+
+    # Where a leaves b, walking along a
+    leaving = set()
+    inside = _inside(a[0], b)
+    for _, k in a_nodes:
+        if k is not None:
+            inside = not inside
+            if not inside:
+                leaving.add(k)
+
+    loops = []
+    todo = set(leaving)
+    while todo:
+        start = k = todo.pop()
+        loop = []
+        while True:
+            # Along a, outside b, to where a enters b ...
+            n = a_at[k]
+            loop.append(points[k])
+            while True:
+                n = (n + 1) % len(a_nodes)
+                point, k = a_nodes[n]
+                if k is not None:
+                    break
+                loop.append(point)
+            # ... then backwards along b, inside a, to where a leaves it again
+            n = b_at[k]
+            loop.append(points[k])
+            while True:
+                n = (n - 1) % len(b_nodes)
+                point, k = b_nodes[n]
+                if k is not None:
+                    break
+                loop.append(point)
+            if k == start:
+                break
+            todo.discard(k)
+        loop = _clean(loop)
+        if len(loop) > 2 and abs(signed_area(loop)) > TOLERANCE:
+            loops.append(loop)
+    return loops
+
+
+def filleted(points, radius):
+    # The corners of a closed polygon as (x, y, bulge) vertices with every
+    # corner rounded by `radius`. A vertex's bulge is tan(sweep / 4) of the
+    # arc from it to the next one, 0 for straight edges (as in DXF).
+    if not radius:
+        return [(x, y, 0.0) for x, y in points.tolist()]
+    vertices = []
+    before = points - np.roll(points, 1, axis=0)
+    after = np.roll(before, -1, axis=0)
+    lengths = np.hypot(before[:, 0], before[:, 1])
+    turns = np.arctan2(_cross(before, after), np.einsum("ij,ij->i", before, after))
+    tangents = radius * np.tan(np.abs(turns) / 2)
+    if np.any(tangents + np.roll(tangents, 1) > lengths + TOLERANCE):
+        raise ValueError(f"Edges too short for a {radius}mm fillet")
+    for point, u, v, turn, t in zip(
+        points, before / lengths[:, None], np.roll(before / lengths[:, None], -1, axis=0),
+        turns, tangents,
+    ):
+        start, end = point - u * t, point + v * t
+        vertices.append((*start.tolist(), math.tan(turn / 4)))
+        vertices.append((*end.tolist(), 0.0))
+    return vertices
+
+
+class Plate:
+    # A flat profile to cut, in mm: outlines whose corners get filleted,
+    # polygon holes and (x, y, radius) circular holes
+    def __init__(self, label, outlines, holes=(), circles=(), fillet=0):
+        self.label = label
+        self.outlines = [np.asarray(o, dtype=float) for o in outlines]
+        self.holes = [np.asarray(h, dtype=float) for h in holes]
+        self.circles = np.asarray(circles, dtype=float).reshape(-1, 3)
+        self.fillet = fillet
+
+    def loops(self):
+        # Every closed path as (x, y, bulge) vertices
+        return [filleted(o, self.fillet) for o in self.outlines] + [
+            filleted(h, 0) for h in self.holes
+        ]
+
+    def bounds(self):
+        points = np.concatenate(self.outlines)
+        return points.min(axis=0), points.max(axis=0)
+
+    def area(self):
+        # Including the fillets, less the holes
+        total = 0.0
+        for loop in [filleted(o, self.fillet) for o in self.outlines]:
+            points = np.array([(x, y) for x, y, _ in loop])
+            total += signed_area(points)
+            for (x0, y0, bulge), (x1, y1, _) in zip(loop, loop[1:] + loop[:1]):
+                if bulge:
+                    # The circular segment between the chord and the arc
+                    sweep = 4 * math.atan(bulge)
+                    radius = math.hypot(x1 - x0, y1 - y0) / (2 * math.sin(abs(sweep) / 2))
+                    total += math.copysign(radius**2 / 2 * (abs(sweep) - math.sin(abs(sweep))), sweep)
+        total -= sum(abs(signed_area(h)) for h in self.holes)
+        return total - np.pi * np.sum(self.circles[:, 2] ** 2)
+
+    def _mapped(self, label, transform, reverse=False):
+        order = slice(None, None, -1) if reverse else slice(None)
+        circles = self.circles.copy()
+        circles[:, :2] = transform(circles[:, :2])
+        return Plate(
+            label,
+            [transform(o)[order] for o in self.outlines],
+            [transform(h)[order] for h in self.holes],
+            circles,
+            self.fillet,
+        )
+
+    def moved(self, offset):
+        return self._mapped(self.label, lambda p: p + offset)
+
+    def handed(self, hand):
+        # As cut for the `hand` half, mirrored about x = 0 like the parts
+        if hand not in HANDS:
+            raise ValueError(f"Unknown hand {hand!r}")
+        label = f"{self.label} ({hand})"
+        if hand == BUILT_HAND:
+            return self._mapped(label, lambda p: p)
+        return self._mapped(label, lambda p: p * [-1, 1], reverse=True)
+
+
+def _rectangles(positions, size):
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * size / 2
+    angles = np.radians(positions[:, 2])
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x, y = corners[:, 0], corners[:, 1]
+    return np.stack([cos * x - sin * y, sin * x + cos * y], axis=-1) + positions[:, None, :2]
+
+
+def _screws(cols, screw_radius):
+    if not screw_radius:
+        return ()
+    screws = layout.screw_positions(cols)
+    return np.column_stack([screws, np.full(len(screws), screw_radius)])
+
+
+def base_plate(cols=6, screw_radius=SCREW_RADIUS, do_fillet=True):
+    # Like BasePlateSketch: the outline with its screw holes
+    return Plate(
+        f"Base plate {cols} cols",
+        [_ccw(layout.base_plate_outline(cols))],
+        circles=_screws(cols, screw_radius),
+        fillet=FILLET_RADIUS if do_fillet and not is_draft() else 0,
+    )
+
+
+def key_plate(
+    cols=6, key_size=PLATE_KEY_HOLE, screw_radius=SCREW_RADIUS, cut_display=True,
+    do_fillet=True,
+):
+    # Like KeyPlateSketch: the base plate less the MC/display cutout, with
+    # holes for the keys and screws
+    outlines = [_ccw(layout.base_plate_outline(cols))]
+    if cut_display:
+        outlines = difference(outlines[0], layout.mc_cutout_outline())
+    return Plate(
+        f"Key plate {cols} cols",
+        outlines,
+        list(_rectangles(layout.key_positions(cols), key_size)),
+        _screws(cols, screw_radius),
+        FILLET_RADIUS if do_fillet and not is_draft() else 0,
+    )
+
+
+BUILDERS = {"key": key_plate, "base": base_plate}
+
+
+def nest(plates, sheet=SHEET, gap=GAP):
+    # Shelf packing of the plates' bounding boxes: tallest first, left to
+    # right in rows from the bottom of the sheet, a new sheet once full
+    size = np.array(sheet, dtype=float)
+    sheets, shelf_y, shelf_height, x = [], gap, 0.0, gap
+
+    def plate_height(plate):
+        low, high = plate.bounds()
+        return high[1] - low[1]
+
+    for plate in sorted(plates, key=plate_height, reverse=True):
+        low, high = plate.bounds()
+        width, height = high - low
+        if width + 2 * gap > size[0] or height + 2 * gap > size[1]:
+            raise ValueError(f'"{plate.label}" doesn\'t fit on a {sheet[0]}x{sheet[1]}mm sheet')
+        if x + width + gap > size[0]:
+            shelf_y, shelf_height, x = shelf_y + shelf_height + gap, 0.0, gap
+        if not sheets or shelf_y + height + gap > size[1]:
+            sheets.append([])
+            shelf_y, shelf_height, x = gap, 0.0, gap
+        sheets[-1].append(plate.moved(np.array([x, shelf_y]) - low))
+        shelf_height = max(shelf_height, height)
+        x += width + gap
+    return sheets
+
+
+def _number(value):
+    return f"{value:.6f}".rstrip("0").rstrip(".")
+
+
+def write_dxf(plates, path):
+    # AutoCAD R12 ASCII DXF in mm: a closed POLYLINE (with arc bulges) per
+    # outline and hole, a CIRCLE per round hole, one layer per plate
+    def group(code, value):
+        return f"{code:>3}\n{value}\n"
+
+    with open(path, "w") as f:
+        f.write(group(0, "SECTION") + group(2, "HEADER"))
+        f.write(group(9, "$ACADVER") + group(1, "AC1009"))
+        f.write(group(9, "$INSUNITS") + group(70, 4))
+        f.write(group(0, "ENDSEC") + group(0, "SECTION") + group(2, "ENTITIES"))
+        for plate in plates:
+            layer = group(8, plate.label.replace(" ", "_"))
+            for loop in plate.loops():
+                f.write(group(0, "POLYLINE") + layer + group(66, 1) + group(70, 1))
+                f.write(group(10, 0) + group(20, 0) + group(30, 0))
+                for x, y, bulge in loop:
+                    f.write(group(0, "VERTEX") + layer)
+                    f.write(group(10, _number(x)) + group(20, _number(y)) + group(30, 0))
+                    if bulge:
+                        f.write(group(42, _number(bulge)))
+                f.write(group(0, "SEQEND") + layer)
+            for x, y, radius in plate.circles.tolist():
+                f.write(group(0, "CIRCLE") + layer)
+                f.write(group(10, _number(x)) + group(20, _number(y)) + group(30, 0))
+                f.write(group(40, _number(radius)))
+        f.write(group(0, "ENDSEC") + group(0, "EOF"))
+
+
+def _svg_path(loop):
+    # y is flipped for SVG, so counter-clockwise arcs have sweep-flag 0
+    x, y, _ = loop[0]
+    data = [f"M{_number(x)},{_number(-y)}"]
+    for (x0, y0, bulge), (x1, y1, _) in zip(loop, loop[1:] + loop[:1]):
+        if not bulge:
+            data.append(f"L{_number(x1)},{_number(-y1)}")
+            continue
+        sweep = 4 * math.atan(bulge)
+        radius = math.hypot(x1 - x0, y1 - y0) / (2 * math.sin(abs(sweep) / 2))
+        large = int(abs(sweep) > math.pi)
+        data.append(
+            f"A{_number(radius)},{_number(radius)} 0 {large} {int(bulge < 0)} "
+            f"{_number(x1)},{_number(-y1)}"
+        )
+    return "".join(data) + "Z"
+
+
+def write_svg(plates, path, size=None):
+    # One group of hairline cut paths per plate, in mm. The drawing is the
+    # `size` of the sheet (from the origin) or the plates' bounds.
+    if size is None:
+        lows, highs = zip(*(plate.bounds() for plate in plates))
+        low, high = np.min(lows, axis=0), np.max(highs, axis=0)
+    else:
+        low, high = np.zeros(2), np.array(size, dtype=float)
+    width, height = high - low
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{_number(width)}mm" '
+            f'height="{_number(height)}mm" '
+            f'viewBox="{_number(low[0])} {_number(-high[1])} {_number(width)} {_number(height)}">\n'
+        )
+        for plate in plates:
+            f.write(
+                f'<g id="{plate.label.replace(" ", "_")}" fill="none" stroke="black" '
+                f'stroke-width="0.1">\n<title>{plate.label}</title>\n'
+            )
+            paths = " ".join(_svg_path(loop) for loop in plate.loops())
+            f.write(f'<path fill-rule="evenodd" d="{paths}"/>\n')
+            for x, y, radius in plate.circles.tolist():
+                f.write(f'<circle cx="{_number(x)}" cy="{_number(-y)}" r="{_number(radius)}"/>\n')
+            f.write("</g>\n")
+        f.write("</svg>\n")
+
+
+def _write(name, plates, formats, out_dir, size=None):
+    paths = []
+    for fmt in formats:
+        if fmt not in PLATE_FORMATS:
+            raise ValueError(f"Unsupported plate format: {fmt}")
+        os.makedirs(os.path.join(out_dir, fmt), exist_ok=True)
+        path = os.path.join(out_dir, fmt, f"{name}.{fmt}")
+        if fmt == "svg":
+            write = functools.partial(write_svg, plates, size=size)
+        else:
+            write = functools.partial(write_dxf, plates)
+        paths.append(write_atomic(path, write))
+    return paths
+
+
+def export_plates(plates, formats=PLATE_FORMATS, out_dir="."):
+    # Each plate to its own file per format
+    return [
+        path
+        for plate in plates
+        for path in _write(plate.label.replace("/", "-"), [plate], formats, out_dir)
+    ]
+
+
+def export_sheets(plates, formats=PLATE_FORMATS, out_dir=".", sheet=SHEET, gap=GAP):
+    # The plates nested onto as few sheets as fit them, a file per sheet
+    return [
+        path
+        for i, nested in enumerate(nest(plates, sheet, gap), 1)
+        for path in _write(f"sheet {i}", nested, formats, out_dir, size=sheet)
+    ]
+
+
+def make_plates(cols=(6,), kinds=PLATES, hands=None, copies=1):
+    plates = [BUILDERS[kind](cols=c) for c in cols for kind in kinds]
+    if hands is not None:
+        plates = [plate.handed(hand) for plate in plates for hand in hands]
+    return [plate for plate in plates for _ in range(copies)]
+
+
+def parse_sheet(text):
+    try:
+        width, height = (float(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got {text!r}")
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the key and base plates as 2D DXF/SVG for laser or CNC "
+        "cutting, without the CAD kernel"
+    )
+    parser.add_argument("--cols", type=int, nargs="+", default=[6], choices=(5, 6))
+    parser.add_argument("--plates", nargs="+", default=list(PLATES), choices=PLATES)
+    parser.add_argument(
+        "--formats", nargs="+", default=list(PLATE_FORMATS), choices=PLATE_FORMATS,
+    )
+    parser.add_argument(
+        "--hands", nargs="+", choices=HANDS,
+        help="cut these halves, the other one mirrored (default: the built half)",
+    )
+    parser.add_argument("-o", "--out-dir", default=".")
+    parser.add_argument(
+        "--nest", action="store_true", help="lay all plates out on sheets instead",
+    )
+    parser.add_argument("--copies", type=int, default=1, help="of each plate, with --nest")
+    parser.add_argument(
+        "--sheet", type=parse_sheet, default=SHEET, metavar="WxH",
+        help=f"sheet size in mm (default: {SHEET[0]}x{SHEET[1]})",
+    )
+    parser.add_argument("--gap", type=float, default=GAP, help="between plates (mm)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    plates = make_plates(args.cols, args.plates, args.hands, args.copies if args.nest else 1)
+    if args.nest:
+        paths = export_sheets(plates, args.formats, args.out_dir, args.sheet, args.gap)
+    else:
+        paths = export_plates(plates, args.formats, args.out_dir)
+    log.info(
+        f"Exported {len(plates)} plates to {len(paths)} files in "
+        f"{(time.perf_counter() - start) * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
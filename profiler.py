@@ -0,0 +1,153 @@
+import functools
+import json
+import os
+import time
+
+import memory
+from deps import call_arguments
+
+PROFILE_ENABLED = os.environ.get("CORNE_PROFILE", "0") != "0"
+
+
+def complexity(shape):
+    return {
+        "faces": len(shape.faces()),
+        "edges": len(shape.edges()),
+        "vertices": len(shape.vertices()),
+    }
+
+
+class Profiler:
+    # Opt-in timing and memory of part builds, one record per build with its
+    # stages. Memory is the process' RSS: the peak while building and what's
+    # still held (the part, caches) afterwards, in bytes.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.builds = []
+        self._open = []
+
+    def enable(self, enabled=True):
+        # Through the environment too, so freshly spawned workers agree
+        self.enabled = enabled
+        os.environ["CORNE_PROFILE"] = "1" if enabled else "0"
+
+    def start(self, part, arguments):
+        rss = memory.current_rss()
+        self._peak()
+        now = time.perf_counter()
+        self._open.append({
+            "part": part,
+            "arguments": {k: repr(v) for k, v in arguments.items()},
+            "start": now,
+            "last": now,
+            "rss_start": rss,
+            "peak_rss": rss,
+            "stages": [],
+        })
+
+    def _peak(self):
+        # The peak since the last call, also counted towards every open build
+        peak = memory.peak_rss()
+        memory.reset_peak()
+        for build in self._open:
+            build["peak_rss"] = max(build["peak_rss"] or 0, peak)
+        return peak
+
+    def stop(self):
+        peak = self._peak()
+        build = self._open.pop()
+        build["seconds"] = time.perf_counter() - build.pop("start")
+        del build["last"]
+        start = build.pop("rss_start")
+        rss = memory.current_rss()
+        build["peak_rss"] = max(build["peak_rss"] or 0, peak)
+        if start is not None and rss is not None:
+            build["rss_retained"] = rss - start
+            build["peak_rss_growth"] = build["peak_rss"] - start
+        self.builds.append(build)
+
+    def record(self, name, shape, start=None, part=None):
+        # A stage ends now, by default it started where the last one ended.
+        # With `part` given, only record into a build of that part.
+        if not self.enabled or not self._open:
+            return
+        build = self._open[-1]
+        if part is not None and build["part"] != part:
+            return
+        end = time.perf_counter()
+        stage = {
+            "name": name,
+            "seconds": end - (build["last"] if start is None else start),
+            "rss": memory.current_rss(),
+            "peak_rss": self._peak(),
+        }
+        if shape is not None:
+            stage.update(complexity(shape))
+        build["stages"].append(stage)
+        # Don't count the complexity bookkeeping towards the next stage
+        build["last"] = time.perf_counter()
+
+    def drain(self):
+        builds, self.builds = self.builds, []
+        return builds
+
+    def report(self, builds=None):
+        return {"builds": self.builds if builds is None else builds}
+
+    def write_json(self, path, builds=None):
+        with open(path, "w") as f:
+            json.dump(self.report(builds), f, indent=2)
+
+    def write_collapsed(self, path, builds=None):
+        # "Cover;add_keys 123456" lines (microseconds), for flamegraph.pl and
+        # speedscope. Time not covered by any stage is attributed to the part.
+        lines = []
+        for build in self.builds if builds is None else builds:
+            staged = sum(s["seconds"] for s in build["stages"])
+            for stage in build["stages"]:
+                lines.append(f"{build['part']};{stage['name']} {round(stage['seconds'] * 1e6)}")
+            rest = build["seconds"] - staged
+            if rest > 0:
+                lines.append(f"{build['part']} {round(rest * 1e6)}")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+profiler = Profiler(enabled=PROFILE_ENABLED)
+
+
+def profiled(cls):
+    # Class decorator: record a build of `cls` with the stages marked inside
+    init = cls.__init__
+
+    @functools.wraps(init)
+    def __init__(self, *args, **kwargs):
+        if not profiler.enabled or type(self) is not cls:
+            return init(self, *args, **kwargs)
+        profiler.start(cls.__qualname__, call_arguments(init, args, kwargs))
+        try:
+            init(self, *args, **kwargs)
+        finally:
+            profiler.stop()
+
+    cls.__init__ = __init__
+    return cls
+
+
+def stage(method):
+    # Method decorator for builder stages that return the shape built so far
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        shape = method(self, *args, **kwargs)
+        profiler.record(method.__name__, shape, start)
+        return shape
+
+    return wrapper
+
+
+def mark(name, shape=None, part=None):
+    # Inline stage boundary for builders that aren't split into methods
+    profiler.record(name, shape, part=part)
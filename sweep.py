@@ -0,0 +1,222 @@
+import argparse
+import ast
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from build import COLS, PARTS, build_part, load_class, part_class, part_kwargs, setup_logging
+from cache import cache
+from deps import call_arguments, overrides
+from export import DEFAULT_FORMATS, FORMATS, export_part
+from memory import release
+from validate import validate
+
+log = logging.getLogger(__name__)
+
+# Intermediates several parts build from, made once per distinct input before
+# the parts so parallel workers load them from the cache instead of racing
+SHARED = [
+    ("corne_board.BasePlateLine", ("cols",), {}),
+    ("corne_board.BasePlateSketch", ("cols",), {"do_fillet": False, "screw_radius": 0}),
+    ("mc_cover.MCCoverSketch", (), {}),
+    ("mc_cover.MCCoverCutoutSketch", (), {}),
+]
+
+
+def split_params(params):
+    # UPPER_CASE names override module constants, the rest are part arguments
+    constants = {k: v for k, v in params.items() if k.isupper()}
+    arguments = {k: v for k, v in params.items() if not k.isupper()}
+    return constants, arguments
+
+
+def grid(axes):
+    # {"cols": [5, 6], "THICKNESS": [6.45, 7]} -> every combination
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def load_variants(path):
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, dict):
+        return grid(spec["grid"])
+    return spec
+
+
+def _shared_tasks(variants):
+    tasks = {}
+    for params in variants:
+        constants, arguments = split_params(params)
+        with overrides(constants):
+            for path, names, fixed in SHARED:
+                cls = load_class(path)
+                kwargs = {**{n: arguments[n] for n in names if n in arguments}, **fixed}
+                key = cache.key(cls, call_arguments(cls.__init__, (), kwargs))
+                tasks.setdefault(key, (cls, kwargs, constants))
+    return list(tasks.values())
+
+
+def _build_shared(cls, kwargs, constants):
+    with overrides(constants):
+        cls(**kwargs)
+
+
+def build_variant_part(variant, name, params, formats, out_dir):
+    constants, arguments = split_params(params)
+    with overrides(constants):
+        start = time.perf_counter()
+        part = build_part(name, arguments)
+        built = time.perf_counter()
+        paths = export_part(part, formats, os.path.join(out_dir, variant))
+        exported = time.perf_counter()
+    # Workers run many of these, keep their memory flat
+    del part
+    release()
+    return {
+        "variant": variant,
+        "part": name,
+        "build_seconds": built - start,
+        "export_seconds": exported - built,
+        "outputs": paths,
+    }
+
+
+def check_variant(variant, params):
+    from clearance import check, summary
+
+    constants, arguments = split_params(params)
+    with overrides(constants):
+        return variant, summary(check(arguments))
+
+
+def check_layouts(variants):
+    # 2D layout problems per variant, found before any of them gets built
+    issues = []
+    for params in variants:
+        constants, arguments = split_params(params)
+        with overrides(constants):
+            issues.append(validate(arguments.get("cols", COLS)))
+    return issues
+
+
+def sweep(
+    variants, names=tuple(PARTS), formats=DEFAULT_FORMATS, out_dir="sweep", jobs=None,
+    clearance=False, check_layout=True,
+):
+    for params in variants:
+        unknown = [
+            k for k in split_params(params)[1]
+            if not any(part_kwargs(part_class(n), {k: None}) for n in names)
+        ]
+        if unknown:
+            raise ValueError(f"No part takes the argument(s) {unknown}")
+
+    start = time.perf_counter()
+    ids = [f"v{i:03d}" for i in range(len(variants))]
+    issues = check_layouts(variants) if check_layout else [[] for _ in variants]
+    valid = [(v, params) for v, params, i in zip(ids, variants, issues) if not i]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        if cache.enabled:
+            tasks = _shared_tasks([params for _, params in valid])
+            shared = [pool.submit(_build_shared, *task) for task in tasks]
+            for f in shared:
+                f.result()
+        futures = [
+            pool.submit(build_variant_part, variant, name, params, formats, out_dir)
+            for variant, params in valid
+            for name in names
+        ]
+        results = [f.result() for f in futures]
+        # The parts are in the cache by now, so the checks only load them
+        checks = dict(pool.map(check_variant, *zip(*valid))) if clearance and valid else {}
+
+    manifest = {"seconds": time.perf_counter() - start, "variants": []}
+    for variant, params, layout_issues in zip(ids, variants, issues):
+        parts = {r["part"]: r for r in results if r["variant"] == variant}
+        manifest["variants"].append({
+            "id": variant,
+            "params": params,
+            "parts": {
+                name: {k: v for k, v in r.items() if k not in ("variant", "part")}
+                for name, r in parts.items()
+            },
+            "build_seconds": sum(r["build_seconds"] for r in parts.values()),
+        })
+        if layout_issues:
+            manifest["variants"][-1]["layout_issues"] = layout_issues
+        if variant in checks:
+            manifest["variants"][-1]["clearance"] = checks[variant]
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def parse_axis(text):
+    # "cols=5,6" -> ("cols", [5, 6]), "STAGGER_OFFSETS=[...],[...]" works too
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE[,VALUE...], got {text!r}")
+    return name, ast.literal_eval(f"[{values}]")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build case variants for a grid or list of parameter sets"
+    )
+    parser.add_argument(
+        "--set", dest="axes", type=parse_axis, action="append", default=[],
+        metavar="NAME=V1,V2",
+        help="grid axis; UPPER_CASE names override module constants "
+        "(e.g. THICKNESS), lower case ones are part arguments (cols, tol_xy)",
+    )
+    parser.add_argument(
+        "--variants", metavar="JSON",
+        help='list of parameter sets, or {"grid": {NAME: [values]}}',
+    )
+    parser.add_argument(
+        "--parts", nargs="+", default=list(PARTS), choices=list(PARTS),
+    )
+    parser.add_argument(
+        "--formats", nargs="+", default=list(DEFAULT_FORMATS), choices=FORMATS,
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="check clearances between the assembled parts of each variant",
+    )
+    parser.add_argument(
+        "--no-validate", action="store_true",
+        help="build variants even if the 2D layout check finds problems",
+    )
+    parser.add_argument("-o", "--out-dir", default="sweep")
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    variants = load_variants(args.variants) if args.variants else []
+    if args.axes:
+        variants += grid(dict(args.axes))
+    if not variants:
+        parser.error("nothing to build, use --set and/or --variants")
+
+    setup_logging(logging.WARNING)
+    manifest = sweep(
+        variants, args.parts, args.formats, args.out_dir, args.jobs, args.check,
+        not args.no_validate,
+    )
+    for variant in manifest["variants"]:
+        print(f"{variant['id']}  {variant['build_seconds']:6.2f}s  {variant['params']}")
+        layout_issues = variant.get("layout_issues", [])
+        if layout_issues:
+            print(f"      skipped, {len(layout_issues)} layout issues: {layout_issues[0]}, ...")
+        for pair, result in variant.get("clearance", {}).items():
+            if result["status"] == "interference":
+                print(f"      interference {pair}: {result['penetration']:.3f}mm")
+    print(f"{len(variants)} variants in {manifest['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 from build123d import *
 
+from cache import cached, memoized
 from cover import HULL_THICKNESS
+from profiler import mark, profiled
 
 C, MIN, MAX = Align.CENTER, Align.MIN, Align.MAX
 
 
+@memoized
+@profiled
+@cached
 class PowerSwitch(Part):
     def __init__(self, **kwargs):
         kwargs["label"] = kwargs.get("label", "Power switch")
@@ -17,10 +22,12 @@ class PowerSwitch(Part):
         ln += Line(ln @ 1, ln @ 1 + Vector(0.4, 0))
 
         sk = make_face(ln + mirror(ln, about=Plane.YZ))
+        mark("profile", sk)
 
         switch = extrude(sk, 2.6)
         switch += Box(2.5, HULL_THICKNESS-0.5, 4.1, align=(C, MAX, MIN))
         switch -= Pos(0, 0, 0.2) * Box(1.5, 1.5, 3.9, align=(C, MAX, MIN))
+        mark("body", switch)
 
         joint_location = Location(-Plane.YX, Vector(0, -(HULL_THICKNESS-0.5), 0))
         joint = RigidJoint("joint", switch, joint_location=joint_location)
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the top of the repo, and the tests shouldn't read or
+# fill the user's BREP cache
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CORNE_CACHE_DIR"] = tempfile.mkdtemp(prefix="corne-test-cache-")
@@ -0,0 +1,56 @@
+import pytest
+from build123d import Compound
+
+from assembly import CONNECTIONS, ROOT, Assembly
+from build import COLS, PARTS, build_part
+
+
+@pytest.fixture(scope="module")
+def parts():
+    return {name: build_part(name, {"cols": COLS}) for name in PARTS}
+
+
+def where(location):
+    return (*location.position, *location.orientation)
+
+
+def test_rigid_joints_meet(parts):
+    assembly = Assembly(parts)
+    for parent, parent_joint, child, child_joint in CONNECTIONS:
+        if parent_joint == "switch_slide":
+            continue
+        a = assembly.placements[parent] * parts[parent].joints[parent_joint].relative_location
+        b = assembly.placements[child] * parts[child].joints[child_joint].relative_location
+        assert where(a) == pytest.approx(where(b), abs=1e-6)
+
+
+def test_switch_slides_along_its_joint(parts):
+    assembly = Assembly(parts)
+    low, high = parts["cover"].joints["switch_slide"].linear_range
+    positions = [
+        assembly.pose(switch_position=p).placements["switch"].position
+        for p in (low, (low + high) / 2, high)
+    ]
+    assert (positions[2] - positions[0]).length == pytest.approx(high - low)
+    assert tuple(positions[1]) == pytest.approx(tuple((positions[0] + positions[2]) * 0.5))
+
+
+def test_placed_shares_geometry(parts):
+    assembly = Assembly(parts)
+    locations = {name: where(part.location) for name, part in parts.items()}
+    for name, part in parts.items():
+        placed = assembly.placed(name)
+        assert placed.wrapped.IsPartner(part.wrapped)
+        assert where(placed.location) == pytest.approx(where(assembly.placements[name]))
+        assert not placed.joints and part.joints
+    # The built parts stay where they were
+    assert {name: where(part.location) for name, part in parts.items()} == locations
+
+
+def test_compound_matches_moved_parts(parts):
+    assembly = Assembly(parts)
+    compound = assembly.compound()
+    moved = Compound(children=[ROOT * assembly.placements[n] * parts[n] for n in parts])
+    a, b = compound.bounding_box(), moved.bounding_box()
+    assert (*a.min, *a.max) == pytest.approx((*b.min, *b.max), abs=1e-3)
+    assert [child.label for child in compound.children] == [p.label for p in parts.values()]
@@ -0,0 +1,15 @@
+import os
+
+from build import PARTS, build
+
+
+def test_incremental_assembly_restores_combined_files(tmp_path):
+    outputs = build(formats=["step"], out_dir=tmp_path, jobs=2, assembly=True, incremental=True)
+    assert set(outputs) == {*PARTS, "assembly"}
+    combined = outputs["assembly"]
+    assert build(formats=["step"], out_dir=tmp_path, jobs=2, assembly=True, incremental=True) == {}
+
+    os.remove(combined[0])
+    outputs = build(formats=["step"], out_dir=tmp_path, jobs=2, assembly=True, incremental=True)
+    assert outputs == {"assembly": combined}
+    assert os.path.exists(combined[0])
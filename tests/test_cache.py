@@ -0,0 +1,74 @@
+import pytest
+from build123d import Pos
+
+import brep
+import export
+from button import Button
+from cache import cache, memo
+from cover import Cover
+from deps import dependencies, overrides
+
+# A layout that still builds, with the last two columns staggered up
+STAGGER = [2, 4.45, 6.8, 4.45, 0.8, 0.8]
+
+
+@pytest.fixture
+def cache_only(monkeypatch):
+    # Builds go through the BREP cache and its checkpoints, not the memo
+    monkeypatch.setattr(cache, "enabled", True)
+    monkeypatch.setattr(memo, "enabled", False)
+
+
+def test_methods_called_through_self_are_dependencies():
+    assert "cover.Cover.add_bottom_joint" in dependencies(Cover.__init__)["sources"]
+
+
+def test_stage_keys_cover_the_base_plate_outline():
+    sources = dependencies(Cover.make_base_sk)["sources"]
+    assert "corne_board.BasePlateSketch" in sources
+    assert "layout._base_plate_outline" in sources
+    assert "layout.STAGGER_OFFSETS" in dependencies(Cover.cut_inset)["constants"]
+
+
+def test_unchanged_part_loads_from_cache(cache_only):
+    Button()
+    hits = cache.hits
+    Button()
+    assert cache.hits == hits + 1
+
+
+def test_changed_constant_rebuilds_part(cache_only):
+    volume = Button().volume
+    with overrides({"HULL_THICKNESS": 4}):
+        assert Button().volume != pytest.approx(volume)
+    assert Button().volume == pytest.approx(volume)
+
+
+def test_changed_constant_invalidates_stage_checkpoints(cache_only, monkeypatch):
+    area = Cover(cols=6).area
+    with overrides({"STAGGER_OFFSETS": STAGGER}):
+        resumed = Cover(cols=6).area
+        monkeypatch.setattr(cache, "enabled", False)
+        rebuilt = Cover(cols=6).area
+    assert rebuilt != pytest.approx(area)
+    assert resumed == pytest.approx(rebuilt)
+
+
+def test_memo_rebuilds_on_changed_constant(monkeypatch):
+    monkeypatch.setattr(memo, "enabled", True)
+    volume = Button().volume
+    with overrides({"HULL_THICKNESS": 4}):
+        assert Button().volume != pytest.approx(volume)
+    assert Button().volume == pytest.approx(volume)
+
+
+def test_memo_hands_out_copies(monkeypatch):
+    monkeypatch.setattr(memo, "enabled", True)
+    first = Button()
+    export.mesh(first, 0.01, 0.1)
+    first.move(Pos(5, 0, 0))
+    second = Button()
+    assert not second.wrapped.IsPartner(first.wrapped)
+    assert not export._triangulated(second)
+    assert tuple(second.location.position) == (0, 0, 0)
+    assert brep.geometry_digest(second) == brep.geometry_digest(Button())
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from build123d import Box, Pos
+
+from clearance import PartMesh, TriangleBVH, check_pair, point_triangle_distance, status
+
+TRIANGLE = np.array([[0, 0, 0], [4, 0, 0], [0, 4, 0]], dtype=float)
+
+
+@pytest.mark.parametrize(
+    "point, distance",
+    [
+        ((1, 1, 2), 2),  # above the face
+        ((-3, -4, 0), 5),  # past a corner
+        ((2, -1, 1), 2 ** 0.5),  # past an edge
+        ((3, 3, 0), 2 ** 0.5),  # past the slanted edge
+    ],
+)
+def test_point_triangle_distance(point, distance):
+    result = point_triangle_distance(np.array([point], dtype=float), TRIANGLE[None])
+    assert result == pytest.approx([distance])
+
+
+def test_bvh_matches_brute_force():
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 10, (300, 1, 3)) + rng.uniform(-1, 1, (300, 3, 3))
+    points = rng.uniform(-2, 12, (200, 3))
+    brute = np.array([
+        point_triangle_distance(np.repeat(p[None], len(corners), axis=0), corners).min()
+        for p in points
+    ])
+    bvh = TriangleBVH(corners, leaf_size=4)
+    assert bvh.distance(points, 100) == pytest.approx(brute)
+    near = bvh.distance(points, 0.5)
+    assert near[brute <= 0.5] == pytest.approx(brute[brute <= 0.5])
+    assert np.all(np.isinf(near[brute > 0.5]))
+
+
+@pytest.fixture(scope="module")
+def boxes():
+    # b is taller and wider, so a's vertices that reach into it are inside
+    return PartMesh(Box(10, 10, 10)), PartMesh(Box(10, 20, 20))
+
+
+# Clearances are from vertices to triangles, overlapping a's inside b are
+# 0.3 from b's face
+@pytest.mark.parametrize(
+    "shift, expected, clearance, penetration",
+    [(10.5, "clear", 0.5, 0), (10, "contact", 0, 0), (9.7, "interference", 0.3, 0.3)],
+)
+def test_check_pair(boxes, shift, expected, clearance, penetration):
+    result = check_pair(*boxes, offset=(shift, 0, 0))
+    assert status(result) == expected
+    assert result["clearance"] == pytest.approx(clearance, abs=1e-6)
+    assert result["penetration"] == pytest.approx(penetration, abs=1e-6)
+
+
+def test_check_pair_beyond_the_limit(boxes):
+    result = check_pair(*boxes, offset=(12, 0, 0), limit=1)
+    assert result["clearance"] is None and status(result) == "clear"
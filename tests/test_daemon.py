@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import daemon
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    # Jobs run on threads and block until released, so the queue stays full
+    release = threading.Event()
+
+    def run_job(job):
+        release.wait(10)
+        now = time.time()
+        return {"started": now, "finished": now, "parts": {}, "rss": 0}, {}
+
+    monkeypatch.setattr(daemon, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(daemon, "_warm", lambda: None)
+    monkeypatch.setattr(daemon, "run_job", run_job)
+    scheduler = daemon.Scheduler(1, max_queued=1)
+    yield scheduler, release
+    release.set()
+    scheduler.shutdown()
+
+
+def test_queue_is_bounded(scheduler):
+    scheduler, release = scheduler
+    job = daemon.parse_job({})
+    running, queued = scheduler.submit(job), scheduler.submit(job)
+    assert running and queued
+    assert scheduler.submit(job) is None
+    assert scheduler.status()["pending"] == 2
+
+    release.set()
+    assert scheduler.wait(queued["id"], 10)["status"] == "done"
+    assert scheduler.submit(job) is not None
+
+
+def test_parse_job_defaults():
+    job = daemon.parse_job({"parts": ["button"], "params": {"THICKNESS": 7}})
+    assert job["parts"] == ["button"]
+    assert job["params"] == {"cols": daemon.COLS, "THICKNESS": 7}
+    assert job["formats"] == list(daemon.DEFAULT_FORMATS)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [[], {"part": ["button"]}, {"parts": ["lid"]}, {"parts": "button"}, {"formats": ["obj"]},
+     {"params": 5}],
+)
+def test_parse_job_rejects(body):
+    with pytest.raises(ValueError):
+        daemon.parse_job(body)
+
+
+def test_parse_wait():
+    assert daemon.parse_wait({}) == 0
+    assert daemon.parse_wait({"wait": ["2.5"]}) == 2.5
+    assert daemon.parse_wait({"wait": ["inf"]}) == daemon.MAX_WAIT
+
+
+@pytest.mark.parametrize("wait", ["abc", "nan", "-1", ""])
+def test_parse_wait_rejects(wait):
+    with pytest.raises(ValueError):
+        daemon.parse_wait({"wait": [wait]})
+
+
+def test_bad_wait_is_a_bad_request(scheduler):
+    scheduler, release = scheduler
+    handler = type("Handler", (daemon.Handler,), {"scheduler": scheduler})
+    server = ThreadingHTTPServer((daemon.HOST, 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{daemon.HOST}:{server.server_port}"
+    try:
+        code, record = daemon._request(f"{url}/jobs", {})
+        assert code == 202
+        assert daemon._request(f"{url}/jobs/{record['id']}?wait=abc")[0] == 400
+        release.set()
+        code, record = daemon._request(f"{url}/jobs/{record['id']}?wait=10")
+        assert (code, record["status"]) == (200, "done")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,104 @@
+import copy
+import os
+import zipfile
+
+import pytest
+from build123d import Compound
+
+import brep
+import export
+from deps import overrides
+from button import Button
+from mc_cover import MCCover
+
+FORMATS = ["stl", "step"]
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    # Paths written through write_atomic, skipped outputs don't show up
+    written = []
+
+    def write_atomic(path, write):
+        written.append(path)
+        return original(path, write)
+
+    original = export.write_atomic
+    monkeypatch.setattr(export, "write_atomic", write_atomic)
+    monkeypatch.setattr(export, "SKIP_UNCHANGED", True)
+    return written
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unchanged_outputs_are_skipped(tmp_path, writes):
+    paths = export.export_part(MCCover(), FORMATS, tmp_path)
+    assert writes == paths
+    assert export.export_part(MCCover(), FORMATS, tmp_path) == paths
+    assert writes == paths
+
+
+def test_geometry_edit_rewrites_outputs(tmp_path, writes):
+    # Moves the display hole, volume and bounding box stay the same
+    paths = export.export_part(MCCover(), FORMATS, tmp_path)
+    before = [read(path) for path in paths]
+    with overrides({"DISPLAY_OFFSET_Y": 11}):
+        moved = MCCover()
+    assert export.export_part(moved, FORMATS, tmp_path) == paths
+    assert writes == paths + paths
+    assert read(paths[0]) != before[0]
+
+
+def test_edited_output_is_rewritten(tmp_path, writes):
+    paths = export.export_part(MCCover(), FORMATS, tmp_path)
+    with open(paths[0], "ab") as f:
+        f.write(b"\0")
+    export.export_part(MCCover(), FORMATS, tmp_path)
+    assert writes == paths + paths[:1]
+
+
+def test_mesh_settings_only_rewrite_meshes(tmp_path, writes):
+    paths = export.export_part(MCCover(), FORMATS, tmp_path)
+    export.export_part(MCCover(), FORMATS, tmp_path, {"parts": {"MC/display cover": (0.1, 0.5)}})
+    assert writes == paths + paths[:1]
+
+
+def test_disabled_skipping_writes_everything(tmp_path, writes, monkeypatch):
+    paths = export.export_part(MCCover(), FORMATS, tmp_path)
+    monkeypatch.setattr(export, "SKIP_UNCHANGED", False)
+    export.export_part(MCCover(), FORMATS, tmp_path)
+    assert writes == paths + paths
+
+
+def triangles(path):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read("3D/3dmodel.model").count(b"<triangle ")
+
+
+def test_assembly_3mf_meshes_skipped_parts(tmp_path, writes):
+    # Fresh, unmeshed parts as after a rebuild, their own 3MFs unchanged
+    def assembly():
+        parts = [brep.loads(brep.dumps(part)) for part in (MCCover(), Button())]
+        return Compound(label="case", children=parts)
+
+    paths = export.export_assembly(assembly(), ["3mf"], tmp_path)
+    combined = paths[-1]
+    count = triangles(combined)
+    os.remove(combined)
+    assert export.export_assembly(assembly(), ["3mf"], tmp_path) == paths
+    assert writes == paths + [combined]
+    assert triangles(combined) == count > 0
+
+
+def test_geometry_digest_is_exact():
+    part = MCCover()
+    digest = brep.geometry_digest(part)
+    assert brep.geometry_digest(brep.loads(brep.dumps(part))) == digest
+    assert brep.geometry_digest(copy.copy(part)) == digest
+    export.mesh(part, 1e-3, 0.1)
+    assert brep.geometry_digest(part) == digest
+    with overrides({"DISPLAY_OFFSET_Y": 11}):
+        assert brep.geometry_digest(MCCover()) != digest
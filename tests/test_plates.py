@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from plates import Plate, difference, nest, signed_area
+
+
+def square(size, x=0, y=0):
+    return np.array([[x, y], [x + size, y], [x + size, y + size], [x, y + size]], dtype=float)
+
+
+def areas(loops):
+    return sorted(signed_area(loop) for loop in loops)
+
+
+def test_difference_of_overlapping_corner():
+    loops = difference(square(10), square(10, 5, 5))
+    assert areas(loops) == pytest.approx([75], abs=1e-5)
+
+
+def test_difference_through_the_middle_splits():
+    bar = np.array([[-1, 4], [11, 4], [11, 6], [-1, 6]], dtype=float)
+    assert areas(difference(square(10), bar)) == pytest.approx([40, 40], abs=1e-5)
+
+
+def test_difference_sharing_edges():
+    # b's edges lie on a's, nudged off them it may come out as a hole
+    loops = difference(square(10), square(5))
+    assert sum(areas(loops)) == pytest.approx(75, abs=1e-5)
+
+
+def test_difference_inside_is_a_hole():
+    outline, hole = difference(square(10), square(2, 4, 4))
+    assert signed_area(outline) == pytest.approx(100)
+    assert signed_area(hole) == pytest.approx(-4)
+
+
+def test_difference_disjoint_and_covered():
+    assert areas(difference(square(10), square(2, 20, 20))) == pytest.approx([100])
+    assert difference(square(2, 4, 4), square(10)) == []
+
+
+def test_filleted_plate_area():
+    plate = Plate("plate", [square(10)], circles=[(5, 5, 1)], fillet=1)
+    assert plate.area() == pytest.approx(100 - (4 - math.pi) - math.pi)
+
+
+def test_nest_fits_sheets_without_overlaps():
+    plates = [Plate(f"plate {i}", [square(90 + i)]) for i in range(8)]
+    sheets = nest(plates, sheet=(300, 200), gap=3)
+    assert sum(len(sheet) for sheet in sheets) == len(plates)
+    assert len(sheets) > 1
+    for sheet in sheets:
+        boxes = [plate.bounds() for plate in sheet]
+        for low, high in boxes:
+            assert np.all(low >= 3) and np.all(high <= [297, 197])
+        for i, (low, high) in enumerate(boxes):
+            for other_low, other_high in boxes[i + 1:]:
+                assert np.any(high + 3 <= other_low + 1e-9) or np.any(other_high + 3 <= low + 1e-9)
+
+
+def test_nest_rejects_plates_larger_than_the_sheet():
+    with pytest.raises(ValueError, match="doesn't fit"):
+        nest([Plate("plate", [square(500)])], sheet=(300, 200))
@@ -0,0 +1,22 @@
+import pytest
+
+import brep
+import params
+from cover import Cover
+
+
+def joints():
+    cover = Cover(cols=6)
+    return len(cover.faces()), sorted(brep.state(cover)["joints"], key=lambda j: j["label"])
+
+
+def test_draft_cover_keeps_the_joints(monkeypatch):
+    faces, final = joints()
+    monkeypatch.setattr(params, "QUALITY", params.DRAFT)
+    draft_faces, draft = joints()
+    assert draft_faces < faces
+    assert [j["label"] for j in draft] == [j["label"] for j in final]
+    for a, b in zip(draft, final):
+        values = a.get("location") or [*a["position"], *a["direction"]]
+        expected = b.get("location") or [*b["position"], *b["direction"]]
+        assert values == pytest.approx(expected, abs=1e-6)
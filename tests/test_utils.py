@@ -0,0 +1,34 @@
+import pytest
+from build123d import Box, Cylinder, GridLocations, Pos, Rectangle, extrude
+
+from utils import batch_cut, parallel_booleans
+
+
+def sequential_cut(shape, locations, *tools):
+    for location in locations:
+        for tool in tools:
+            shape -= location * tool
+    return shape
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_batch_cut_matches_sequential_cuts(parallel):
+    plate = Box(100, 60, 5)
+    locations = list(Pos(0, 0, 2.5) * GridLocations(19, 19, 4, 3))
+    # Overlapping tools, like the pockets and holes of the cover
+    tools = [extrude(Rectangle(15.5, 15.5), -0.8), Cylinder(5, 20)]
+    batched = batch_cut(plate, locations, *tools, parallel=parallel)
+    expected = sequential_cut(plate, locations, *tools)
+    assert batched.volume == pytest.approx(expected.volume)
+    assert batched.area == pytest.approx(expected.area)
+    assert len(batched.faces()) == len(expected.faces())
+    assert len(batched.solids()) == 1
+
+
+def test_parallel_booleans_restores_the_mode():
+    from OCP.BOPAlgo import BOPAlgo_Options
+
+    previous = BOPAlgo_Options.GetParallelMode_s()
+    with parallel_booleans(not previous):
+        assert BOPAlgo_Options.GetParallelMode_s() == (not previous)
+    assert BOPAlgo_Options.GetParallelMode_s() == previous
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from deps import overrides
+from validate import polygon_gaps, rectangles, validate
+
+THUMB_KEYS = [(14.8, -10.8, 30), (35, -7.2, 15), (54.8, -4.5, 0)]
+SCREW_POSITIONS = [(23.05, -4.55), (67.6, 2.1), (108.50, 16.8), (108.50, 33.75), (36.50, 37.2)]
+
+
+@pytest.mark.parametrize("cols", [5, 6])
+def test_default_layout_is_valid(cols):
+    assert validate(cols) == []
+
+
+def test_overlapping_keys():
+    with overrides({"THUMB_KEYS": [THUMB_KEYS[0], (24, -9, 15), THUMB_KEYS[2]]}):
+        issues = validate()
+    assert any(issue.startswith("key spacing: key 0/key 1 ") for issue in issues)
+
+
+def test_screw_under_a_key():
+    # The first screw right on the second thumb key
+    with overrides({"SCREW_POSITIONS": [(35, -7.2), *SCREW_POSITIONS[1:]]}):
+        issues = validate()
+    assert issues == ["screw to key: screw 0/key 1 -2.15mm < 0.05mm"]
+
+
+def test_key_in_the_mc_cutout():
+    with overrides({"THUMB_KEYS": [(9, 30, 0), *THUMB_KEYS[1:]]}):
+        issues = validate()
+    assert any(issue.startswith("key to MC cutout: key 0 ") for issue in issues)
+
+
+def test_polygon_gaps():
+    squares = rectangles(np.array([[0, 0, 0], [12, 0, 0], [0, 0, 45], [0, 0, 0]]), 10)
+    small = rectangles(np.array([[0, 0, 0]]), 2)[0]
+    gaps = polygon_gaps(squares[[0, 0, 0]], np.stack([squares[1], squares[2], small]))
+    assert gaps == pytest.approx([2, 0, 0])
@@ -1,4 +1,12 @@
+from contextlib import contextmanager
+
 from build123d import *
+from build123d.topology import downcast
+from OCP.BOPAlgo import BOPAlgo_Options
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_VERTEX
+from OCP.TopExp import TopExp
+from OCP.TopTools import TopTools_IndexedDataMapOfShapeListOfShape
+
 
 def viz_plane(p, size=100):
     square = p * Rectangle(size, size)
@@ -10,3 +18,62 @@ def viz_plane(p, size=100):
     z_line = p * Rotation(about_x=90) * Line((0, 0), (0, size/4))
     z_line.color = Color(0, 0, 1)
     return Compound(children=[square, x_line, y_line, z_line])
+
+
+@contextmanager
+def parallel_booleans(enabled=True):
+    # Let OCCT run the boolean operations created in this block multi-threaded
+    previous = BOPAlgo_Options.GetParallelMode_s()
+    BOPAlgo_Options.SetParallelMode_s(enabled)
+    try:
+        yield
+    finally:
+        BOPAlgo_Options.SetParallelMode_s(previous)
+
+
+def batch_cut(shape, locations, *tools, parallel=False):
+    # Subtract every tool at every location with a single boolean, instead of
+    # one boolean per feature against an ever more complex shape
+    compound = Compound([loc * tool for loc in locations for tool in tools])
+    with parallel_booleans(parallel):
+        return shape - compound
+
+
+def vertex_edges(shape):
+    # Edges meeting at each vertex of `shape`, from a single pass over its
+    # topology instead of searching every edge for every vertex
+    ancestors = TopTools_IndexedDataMapOfShapeListOfShape()
+    TopExp.MapShapesAndAncestors_s(shape.wrapped, TopAbs_VERTEX, TopAbs_EDGE, ancestors)
+    return {
+        Vertex(downcast(ancestors.FindKey(i))): [
+            Edge(downcast(e)) for e in ancestors.FindFromIndex(i)
+        ]
+        for i in range(1, ancestors.Extent() + 1)
+    }
+
+
+def _leaving(edge, vertex):
+    # Direction `edge` leaves `vertex` in
+    point = Vector(vertex)
+    if (edge @ 0 - point).length < (edge @ 1 - point).length:
+        return (edge % 0).normalized()
+    return -(edge % 1).normalized()
+
+
+def convex_corners(sketch, vertices, edges=None, probe=0.01):
+    # The corners among `vertices` where `sketch` is locally its own convex
+    # hull, i.e. turns outwards. Just inside such a corner, between its two
+    # edges, is inside the sketch; at a concave corner it's outside.
+    edges = vertex_edges(sketch) if edges is None else edges
+    faces = sketch.faces()
+    corners = []
+    for v in vertices:
+        if len(edges[v]) != 2:
+            continue
+        bisector = sum((_leaving(e, v) for e in edges[v]), Vector())
+        if bisector.length < 1e-6:
+            continue
+        point = Vector(v) + bisector.normalized() * probe
+        if any(f.is_inside(point) for f in faces):
+            corners.append(v)
+    return ShapeList(corners)
@@ -0,0 +1,173 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+import layout
+
+log = logging.getLogger(__name__)
+
+# Footprints the 3D parts cut around the key, screw and MC positions: the
+# cover's key pocket and the key hole through it, the counterbore of its
+# screw holes and the threaded insert bosses on the bottom plate
+KEY_POCKET = 15.5
+KEY_HOLE = (13.5, 13.7)
+SCREW_HEAD_RADIUS = 2.15
+SCREW_BOSS_RADIUS = 3
+# Smallest walls left between them, and to the base plate outline (the
+# cover's hull goes around that)
+MIN_KEY_GAP = 1.0
+MIN_SCREW_WALL = 0.05
+MIN_OUTLINE_WALL = 0.3
+
+
+def rectangles(positions, width, height=None):
+    # (n, 4, 2) corners of width x height rectangles centred on the
+    # (x, y, rotation) rows
+    height = width if height is None else height
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * [width / 2, height / 2]
+    angles = np.radians(positions[:, 2])
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x, y = corners[:, 0], corners[:, 1]
+    rotated = np.stack([cos * x - sin * y, sin * x + cos * y], axis=-1)
+    return rotated + positions[:, None, :2]
+
+
+def _point_segment_distance(points, a, b):
+    ab = b - a
+    length = np.maximum(np.einsum("...i,...i", ab, ab), 1e-24)
+    t = np.clip(np.einsum("...i,...i", points - a, ab) / length, 0, 1)
+    return np.linalg.norm(points - (a + ab * t[..., None]), axis=-1)
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def _segments_cross(a0, a1, b0, b1):
+    # Proper crossings only, touching ends are at distance 0 anyway
+    d = a1 - a0
+    e = b1 - b0
+    return (
+        (_cross(d, b0 - a0) * _cross(d, b1 - a0) < 0)
+        & (_cross(e, a0 - b0) * _cross(e, a1 - b0) < 0)
+    )
+
+
+def contains(polygons, points):
+    # Whether points[i] is inside polygons[i] ((n, k, 2), (n, 2)), even-odd
+    p0, p1 = polygons, np.roll(polygons, -1, axis=1)
+    x, y = points[:, None, 0], points[:, None, 1]
+    straddles = (p0[..., 1] > y) != (p1[..., 1] > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_x = p0[..., 0] + (y - p0[..., 1]) * (p1[..., 0] - p0[..., 0]) / (
+            p1[..., 1] - p0[..., 1]
+        )
+    return np.sum(straddles & (x < cross_x), axis=1) % 2 == 1
+
+
+def boundary_distance(polygons, points):
+    # Distance from points[i] to the outline of polygons[i]
+    p0, p1 = polygons, np.roll(polygons, -1, axis=1)
+    return _point_segment_distance(points[:, None], p0, p1).min(axis=1)
+
+
+def boundary_gaps(a, b):
+    # Smallest distance between the outlines of polygons a[i] and b[i]
+    # ((n, k, 2), (n, l, 2)), 0 where they touch or cross
+    a0, a1 = a[:, :, None], np.roll(a, -1, axis=1)[:, :, None]
+    b0, b1 = b[:, None], np.roll(b, -1, axis=1)[:, None]
+    gaps = np.minimum(
+        _point_segment_distance(a0, b0, b1).min(axis=(1, 2)),
+        _point_segment_distance(b0, a0, a1).min(axis=(1, 2)),
+    )
+    return np.where(_segments_cross(a0, a1, b0, b1).any(axis=(1, 2)), 0.0, gaps)
+
+
+def polygon_gaps(a, b):
+    # Like boundary_gaps, and 0 where one polygon lies inside the other
+    inside = contains(b, a[:, 0]) | contains(a, b[:, 0])
+    return np.where(inside, 0.0, boundary_gaps(a, b))
+
+
+def _pairs(n):
+    i, j = np.triu_indices(n, 1)
+    return i, j
+
+
+def _issues(check, labels, values, minimum):
+    # Messages for the values below `minimum`, worst first
+    bad = np.flatnonzero(values < minimum - 1e-9)
+    return [
+        f"{check}: {labels[k]} {values[k]:.2f}mm < {minimum}mm"
+        for k in bad[np.argsort(values[bad])]
+    ]
+
+
+def validate(cols=6):
+    # Problems with the 2D layout for `cols` columns and the current
+    # constants, as messages. Only needs the positions and outlines from
+    # layout, no CAD kernel.
+    keys = layout.key_positions(cols)
+    screws = layout.screw_positions(cols)
+    outline = layout.base_plate_outline(cols)
+    cutout = layout.mc_cutout_outline()
+    pockets = rectangles(keys, KEY_POCKET)
+    names = [f"key {k}" for k in range(len(keys))]
+    screw_names = [f"screw {s}" for s in range(len(screws))]
+    issues = []
+
+    i, j = _pairs(len(keys))
+    gaps = polygon_gaps(pockets[i], pockets[j])
+    issues += _issues(
+        "key spacing", [f"{names[a]}/{names[b]}" for a, b in zip(i, j)], gaps, MIN_KEY_GAP
+    )
+
+    # Every screw head against every key hole, negative where they overlap
+    holes = rectangles(keys, *KEY_HOLE)
+    s, k = np.divmod(np.arange(len(screws) * len(keys)), len(keys))
+    centers = screws[s]
+    walls = boundary_distance(holes[k], centers) - SCREW_HEAD_RADIUS
+    walls[contains(holes[k], centers)] = -SCREW_HEAD_RADIUS
+    issues += _issues(
+        "screw to key", [f"{screw_names[a]}/{names[b]}" for a, b in zip(s, k)],
+        walls, MIN_SCREW_WALL,
+    )
+
+    # Keys clear of the MC cutout
+    gaps = polygon_gaps(pockets, np.broadcast_to(cutout, (len(keys), *cutout.shape)))
+    issues += _issues("key to MC cutout", names, gaps, MIN_KEY_GAP)
+
+    # Key pockets and screw bosses inside the outline
+    outlines = np.broadcast_to(outline, (len(keys), *outline.shape))
+    walls = boundary_gaps(pockets, outlines)
+    walls[~contains(outlines, keys[:, :2])] = 0
+    issues += _issues("key inside outline", names, walls, MIN_OUTLINE_WALL)
+
+    outlines = np.broadcast_to(outline, (len(screws), *outline.shape))
+    walls = boundary_distance(outlines, screws) - SCREW_BOSS_RADIUS
+    walls[~contains(outlines, screws)] = -SCREW_BOSS_RADIUS
+    issues += _issues("screw inside outline", screw_names, walls, MIN_OUTLINE_WALL)
+    return issues
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the 2D key, screw and outline layout without building"
+    )
+    parser.add_argument("--cols", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    issues = validate(args.cols)
+    log.info(f"Checked the layout in {(time.perf_counter() - start) * 1000:.1f}ms")
+    for issue in issues:
+        print(issue)
+    if issues:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()